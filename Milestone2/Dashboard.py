@@ -2,14 +2,16 @@ import dash
 
 from dash import dcc
 from dash import html
-import asyncio
-import aiohttp
-import pandas as pd
-import base64
+import os
+import flask
 import pkg_resources
-from sklearn.preprocessing import StandardScaler
-from scipy.spatial.distance import cdist
 import plotly.express as px
+from functools import lru_cache
+from dashboard_data import (ALL_SEASONS, N_SIMILAR, SIMILAR_COLUMNS, distribution_lookup, position_distributions,
+                            shared_frame, similar_players)
+from player_lookup import LOOKUP_PATH, add_positions, load_player_lookup, refresh_in_background
+from player_search import PlayerSearch
+from similarity_index import load_or_build
 
 # Print the versions of the packages used
 print(f"dash version: {pkg_resources.get_distribution('dash').version}")
@@ -18,64 +20,51 @@ print(f"plotly version: {pkg_resources.get_distribution('plotly').version}")
 print(f"aiohttp version: {pkg_resources.get_distribution('aiohttp').version}")
 print(f"pyarrow version: {pkg_resources.get_distribution('pyarrow').version}")
 
-# Load the data
-df = pd.read_parquet("data/21-25player_clusters.parquet")
-
-def player_info(seasons):
-    
-    headers = {'Connection': 'keep-alive',
-            'Host': 'stats.nba.com',
-            'Origin': 'http://stats.nba.com',
-            'Upgrade-Insecure-Requests': '1',
-            'Referer': 'https://stats.nba.com',
-            'x-nba-stats-origin': 'stats',
-            'x-nba-stats-token': 'true',
-            'Accept-Language': 'en-US,en;q=0.5',
-            "Accept": "application/json, text/plain, */*",
-            "X-NewRelic-ID": "VQECWF5UChAHUlNTBwgBVw==",
-            'User-Agent': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) " + \
-                            "AppleWebKit/537.36 (KHTML, like Gecko) " + \
-                            "Chrome/84.0.4147.89 Safari/537.36"}
-
-
-    async def fetch_play_by_play(session, season):
-        url = f"https://stats.nba.com/stats/playerindex?Active=&AllStar=&College=&Country=&DraftPick=&DraftRound=&DraftYear=&Height=&Historical=&LeagueID=00&Season={season}&TeamID=0&Weight="
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                df =  pd.DataFrame(data['resultSets'][0]['rowSet'], columns=data['resultSets'][0]['headers'])
-                return df
-            else:
-                print(f"Error fetching play-by-play data for game {season} from {url}: {response.status}")
-                return pd.DataFrame()
-
-    async def main():
-        async with aiohttp.ClientSession() as session:
-            total_data = pd.DataFrame()
-            for season in seasons:
-                player_data = await fetch_play_by_play(session, season)
-                total_data = pd.concat([player_data])
-            # Concatenate all play-by-play data into a single DataFrame
-            return total_data
-            
-
-            
-
-    # Run the main function
-    result = asyncio.run(main())
-    return result
-player_info_df = player_info(df['SEASON'].unique())
-# Merge the player_info_df with the original df to get the positions
-df = df.merge(player_info_df[['PERSON_ID', 'POSITION']], left_on='PLAYER_ID', right_on='PERSON_ID', how='left')
-
-# Create the 'positions' column
-df['positions'] = df['POSITION']
+# Load the data (memory-mapped from an Arrow copy of the clusters file, shared by gunicorn workers)
+df = shared_frame("data/21-25player_clusters.parquet")
+# Similar players are looked up in the shared feature store (rebuilt only when the clusters file
+# changes; rows are in the same order as df)
+similarity_index = load_or_build("data/21-25player_clusters.parquet")
+# (normalised name, season) -> row plus prefix/trigram indexes for the search box's suggestions
+player_search = PlayerSearch.from_keys(similarity_index.keys)
+# Every player-season's top N_SIMILAR neighbours, preformatted and stored as Parquet; a click
+# only slices its block of rows
+similar_cells = similar_players(df, similarity_index)[SIMILAR_COLUMNS].to_numpy()
+
+# Positions come from the local lookup built by player_lookup.py, so startup never waits on
+# stats.nba.com; the lookup is re-checked in the background every hour and rebuilt once stale or
+# missing (refresh_positions), and every worker notices the rewritten file by its mtime. Only the
+# distributions keep positions, so the shared df is never copied
+def lookup_mtime():
+    return os.path.getmtime(LOOKUP_PATH) if os.path.exists(LOOKUP_PATH) else None
+
+def reload_positions():
+    global distributions, positions_mtime
+    positions_mtime = lookup_mtime()
+    distributions = distribution_lookup(position_distributions(add_positions(df, load_player_lookup())))
+    bar_figure.cache_clear()
+
+def refresh_positions():
+    return refresh_in_background(df['SEASON'].unique().tolist())
+
+# Position share of every cluster, overall and per season, computed once; the bar graph callback
+# only looks its selection up
+positions_mtime = lookup_mtime()
+distributions = distribution_lookup(position_distributions(add_positions(df, load_player_lookup())))
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
+# WSGI entry point for production: gunicorn -c gunicorn.conf.py Dashboard:server
+server = app.server
 
 image_filename = '21-25data.png'  # Replace with your image file
-encoded_image = base64.b64encode(open(image_filename, 'rb').read()).decode()
+
+# The heatmap is served as a cacheable file instead of being inlined as base64 into every page;
+# the ?v=<mtime> in the layout changes whenever clustering.py rewrites it
+@server.route('/heatmap.png')
+def heatmap():
+    return flask.send_file(os.path.abspath(image_filename), mimetype='image/png', max_age=24 * 60 * 60,
+                           conditional=True)
 
 # Define the layout
 app.layout = html.Div(children=[
@@ -83,7 +72,7 @@ app.layout = html.Div(children=[
 
     html.Img(
         id='heatmap',
-        src=f'data:image/png;base64,{encoded_image}',
+        src=f'/heatmap.png?v={int(os.path.getmtime(image_filename))}',
         style={'width': '800px'}  # Adjust the width to match the bar graph
     ),
 
@@ -92,86 +81,115 @@ app.layout = html.Div(children=[
         options=[{'label': str(cluster), 'value': cluster} for cluster in df['Cluster_Labels'].unique()],
         value=df['Cluster_Labels'].unique()[0]
     ),
+    dcc.Dropdown(
+        id='season-dropdown',
+        options=[{'label': season, 'value': season} for season in [ALL_SEASONS] + sorted(df['SEASON'].unique())],
+        value=ALL_SEASONS
+    ),
     dcc.Graph(
         id='bar-graph'
     ),
     dcc.Input(
         id='player-name-input',
         type='search',
+        list='player-suggestions',
         placeholder='Enter player name'
     ),
+    html.Datalist(id='player-suggestions'),
+    dcc.Dropdown(
+        id='player-season-dropdown',
+        placeholder='Season'
+    ),
     html.Button('Search', id='search-button', n_clicks=0),
 
     html.Table(id='similar-players-table'),
 ])
 
-# Define the callback to update the bar graph based on the selected cluster
-@app.callback(
-    dash.dependencies.Output('bar-graph', 'figure'),
-    [dash.dependencies.Input('cluster-dropdown', 'value')]
-)
-def update_bar_graph(selected_cluster):
-    filtered_df = df[df['Cluster_Labels'] == selected_cluster]
-    
-    # Bar graph
-    position_counts = filtered_df['positions'].value_counts(normalize=True) * 100
-    bar_fig = px.bar(position_counts, x=position_counts.index, y=position_counts.values, labels={'x': 'Position', 'y': 'Percentage'}, title=f'Position Distribution for Cluster {selected_cluster}')
-    
+# Figures are cached per (cluster, season) as plain dicts, so repeated selections skip Plotly
+@lru_cache(maxsize=256)
+def bar_figure(selected_cluster, selected_season):
+    positions, percents = distributions.get((selected_season, selected_cluster), ((), ()))
+    title = f'Position Distribution for Cluster {selected_cluster}'
+    if selected_season != ALL_SEASONS:
+        title += f' ({selected_season})'
+    bar_fig = px.bar(x=list(positions), y=list(percents), labels={'x': 'Position', 'y': 'Percentage'}, title=title)
+
     # Update the layout to make the bar graph thinner
     bar_fig.update_layout(
         width=400,  # Adjust the width as needed
         height=600  # Adjust the height as needed
     )
-    
-    return bar_fig
+
+    return bar_fig.to_dict()
+
+# Define the callback to update the bar graph based on the selected cluster and season
+@app.callback(
+    dash.dependencies.Output('bar-graph', 'figure'),
+    [dash.dependencies.Input('cluster-dropdown', 'value'),
+     dash.dependencies.Input('season-dropdown', 'value')]
+)
+def update_bar_graph(selected_cluster, selected_season):
+    if lookup_mtime() != positions_mtime:
+        reload_positions()
+    return bar_figure(selected_cluster, selected_season or ALL_SEASONS)
+
+# Suggestions for the search box on every keystroke, from the in-memory name indexes
+@app.callback(
+    dash.dependencies.Output('player-suggestions', 'children'),
+    [dash.dependencies.Input('player-name-input', 'value')]
+)
+def update_player_suggestions(text):
+    return [html.Option(value=name) for name in player_search.suggest(text)]
+
+# Seasons the typed player has rows for, latest selected
+@app.callback(
+    [dash.dependencies.Output('player-season-dropdown', 'options'),
+     dash.dependencies.Output('player-season-dropdown', 'value')],
+    [dash.dependencies.Input('player-name-input', 'value')]
+)
+def update_player_seasons(text):
+    player_name = player_search.resolve(text)
+    seasons = player_search.player_seasons(player_name) if player_name else []
+    return [{'label': season, 'value': season} for season in seasons], seasons[-1] if seasons else None
 
 # Define the callback to update the table based on the player name input
 @app.callback(
     dash.dependencies.Output('similar-players-table', 'children'),
     [dash.dependencies.Input('search-button', 'n_clicks')],
-    [dash.dependencies.State('player-name-input', 'value')]
+    [dash.dependencies.State('player-name-input', 'value'),
+     dash.dependencies.State('player-season-dropdown', 'value')]
 )
-def update_similar_players_table(n_clicks, player_name):
+def update_similar_players_table(n_clicks, player_name, season):
     if n_clicks is None or player_name is None:
         return []
 
-    season = '2024-25'
+    # Misspelt or differently accented names resolve to the closest indexed player
+    player_name = player_search.resolve(player_name) or player_name
+    if season is None:
+        seasons = player_search.player_seasons(player_name)
+        season = seasons[-1] if seasons else '2024-25'
 
-    player_data = df[(df['player_name'] == player_name) & (df['SEASON'] == season)]
-    if player_data.empty:
+    row = player_search.row(player_name, season)
+    if row is None:
         print(f"Player {player_name} not found in the {season} season.")
         return [html.Tr([html.Td(f"Player {player_name} not found in the {season} season.")])]
     else:
-        player_cluster = player_data['Cluster_Labels'].values[0]
+        player_cluster = df['Cluster_Labels'].iat[row]
         print(f"Player: {player_name}, Season: {season}, Cluster: {player_cluster}")
 
-        # Calculate cosine similarity
-        player_vector = player_data[['AVG_2_DIST', 'AVG_3_DIST', 'FG2_PCT', 'FG3_PCT','DREB','STL','BLK','PF','FG2Target','FG3Target']].values
-        all_vectors = df[['AVG_2_DIST', 'AVG_3_DEF_DIST', 'FG2_PCT', 'FG3_PCT', 'DREB','STL','BLK','PF','FG2Target','FG3Target']].values
-        # Get the indices of the top 3 most similar players
-        scaler = StandardScaler()
-        all_vectors = scaler.fit_transform(all_vectors)
-        player_vector = scaler.transform(player_vector)
-
-        similarities = cdist(player_vector, all_vectors, metric='euclidean').flatten()
-        similar_indices = similarities.argsort()[:4]
-
-        similar_players = df.iloc[similar_indices][['player_name', 'SEASON', 'Cluster_Labels','FG2_PCT','FG2Target', 'FG3_PCT','FG3Target','DREB','STL','BLK','PF']]
-        # Format the 'FG2_PCT', 'FG2Target', 'FG3_PCT', 'FG3Target' columns as percentages
-        similar_players['FG2_PCT'] = similar_players['FG2_PCT'].apply(lambda x: f"{x:.2%}")
-        similar_players['FG2Target'] = similar_players['FG2Target'].apply(lambda x: f"{x:.2%}")
-        similar_players['FG3_PCT'] = similar_players['FG3_PCT'].apply(lambda x: f"{x:.2%}")
-        similar_players['FG3Target'] = similar_players['FG3Target'].apply(lambda x: f"{x:.2%}")
+        # The player themselves comes first, then the top 3 most similar players
+        similar_rows = similar_cells[row * (N_SIMILAR + 1):(row + 1) * (N_SIMILAR + 1)]
         table_header = [
-            html.Thead(html.Tr([html.Th(col) for col in similar_players.columns]))
+            html.Thead(html.Tr([html.Th(col) for col in SIMILAR_COLUMNS]))
         ]
         table_body = [
-            html.Tbody([html.Tr([html.Td(similar_players.iloc[i][col]) for col in similar_players.columns]) for i in range(len(similar_players))])
+            html.Tbody([html.Tr([html.Td(value) for value in values]) for values in similar_rows.tolist()])
         ]
         return table_header + table_body
     # Create the table rows
 
 
-# Run the app
+# Run the app (development server; gunicorn.conf.py starts the refresh in every worker instead)
 if __name__ == '__main__':
+    refresh_positions()
     app.run_server(debug=True)
\ No newline at end of file
@@ -1,7 +1,4 @@
 import pandas as pd
-import pyarrow as pa
-
-import pyarrow.parquet as pq
 
 # Read Parquet file into DataFrame
 def process_defender_dashboard(df):
@@ -98,49 +95,15 @@ def process_play_by_play(df):
 def filter_player_stats(df):
     return df[['PLAYER_ID', 'DREB', 'STL', 'BLK', 'PF', 'SEASON','GP']]
 
-df = pd.read_parquet('data/23_24defender_dashboard.parquet')
-agg_df = process_defender_dashboard(df)
-
-pbp_df = pd.read_parquet('data/23_24_combined_pbp.parquet')
-final_agg_df = process_play_by_play(pbp_df)
-
-player_stats_df = pd.read_parquet('data/2024-25player_per100poss.parquet')
-filtered_df = filter_player_stats(player_stats_df)
-
-player_anthro_df = pd.read_parquet('data/00_24_anthro.parquet')
-filtered_player_anthro_df = player_anthro_df[['PLAYER_ID', 'HEIGHT_WO_SHOES','WINGSPAN']]
-filtered_player_anthro_df['PLAYER_ID'] = filtered_player_anthro_df['PLAYER_ID'].astype(int)
-#print(filtered_player_anthro_df.head(10))
-
-player_info_df = pd.read_parquet('data/2024-25player_info.parquet')
-
-filtered_player_info_df = player_info_df[['PERSON_ID', 'DISPLAY_LAST_COMMA_FIRST', 'DISPLAY_FIRST_LAST']]
-filtered_player_info_df['PERSON_ID'] = filtered_player_info_df['PERSON_ID'].astype(int)
-agg_df['PLAYER_ID'] = agg_df['PLAYER_ID'].astype(int)
-merged_df = agg_df.merge(filtered_player_info_df, left_on='PLAYER_ID', right_on='PERSON_ID', how='left')
-merged_df = merged_df.merge(filtered_player_anthro_df, on='PLAYER_ID', how='left')
-merged_df = merged_df.merge(final_agg_df, left_on='DISPLAY_FIRST_LAST', right_on='player_name', how='left')
-merged_df = merged_df.merge(filtered_df, on='PLAYER_ID', how='left')
-
-merged_df['FG2Target'] = merged_df['FG2A']/merged_df['total_2pta']
-merged_df['FG3Target'] = merged_df['FG3A']/merged_df['total_3pta']
-merged_df['FGTarget'] = merged_df['FGA']/merged_df['total_possessions']
-merged_df['2FG%diff'] = merged_df['FG2_PCT'] - (merged_df['total_2ptm']/merged_df['total_2pta'])
-merged_df['3FG%diff'] = merged_df['FG3_PCT'] - (merged_df['total_3ptm']/merged_df['total_3pta'])
-merged_df['Poss/Game'] = merged_df['total_possessions']/merged_df['GP']
-
-merged_df.drop(columns = ['FG2M','FG2A','FG3M','FG3A','total_possessions','GP','FGA','TOT_DIST_2', 'TOT_DIST_3', 'total_2pta','total_2ptm','total_3ptm','total_3pta','DISPLAY_FIRST_LAST','PERSON_ID','DISPLAY_LAST_COMMA_FIRST'], inplace=True)
-#print(merged_df.describe(include='all'))
-merged_df.dropna(inplace=True)
-
-# Reorder columns
-cols = ['player_name', 'SEASON', 'PLAYER_ID'] + [col for col in merged_df.columns if col not in ['player_name', 'SEASON', 'PLAYER_ID']]
-merged_df = merged_df[cols]
-
-pd.set_option('display.max_columns', None)
-
-# Display summary of the DataFrame
-#print(merged_df.describe(include='all'))
-print(merged_df.head(10))
-# Save the merged DataFrame as a Parquet file
-merged_df.to_parquet('data/23_24merged_player_stats.parquet', index=False)
\ No newline at end of file
+if __name__ == '__main__':
+    # Builds data/<yy_yy>merged_player_stats.parquet for each season (in parallel, one season per
+    # process) and the combined multi-season file, see merged_stats.py
+    #   python "Data Formatting.py" 2021-22 2022-23 2023-24 2024-25
+    import argparse
+    from merged_stats import SEASONS, build_seasons
+    parser = argparse.ArgumentParser()
+    parser.add_argument('seasons', nargs='*', default=SEASONS)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    build_seasons(args.seasons, args.data_dir, args.workers)
@@ -1,17 +1,15 @@
-import numpy as np
-import pandas as pd
-from sklearn.decomposition import KernelPCA
-from sklearn.preprocessing import StandardScaler
 import matplotlib.pyplot as plt
+from data_access import read_stage
+from feature_store import load_or_build
+from projection import project
 
-df = pd.read_parquet('data/21-25player_clusters.parquet')
-X = df[['FG2Target','FG2_PCT','AVG_2_DIST', 'FG3Target','FG3_PCT','AVG_3_DIST', 'DREB','BLK','PF','STL',]]
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
-pca = KernelPCA(n_components=2, kernel='sigmoid')
-transformed_data = pca.fit_transform(X)
-df['PCA1'] = transformed_data[:, 0]
-df['PCA2'] = transformed_data[:, 1]
+df = read_stage('projection', 'data/21-25player_clusters.parquet')
+# Sigmoid KernelPCA of the shared feature store (same row order as df), Nystroem-approximated on
+# 1000 landmark rows. The reducer is fitted once and saved in data/projections; later runs only
+# project new player-seasons (python projection.py kpca-nystroem --refit to refit)
+points, pca = project(load_or_build('data/21-25player_clusters.parquet'), 'kpca-nystroem')
+df['PCA1'] = points['x'].to_numpy()
+df['PCA2'] = points['y'].to_numpy()
 cluster_dict = {'1. Perimeter Secondary Option': 1, '3. The Marks': 3,
                 '5. Enforcers/Inside Help': 5 ,'9. Pickpockets': 9,
                 '7. Perimeter and Inside Help': 7, '2. Perimeter Bad Defenders': 2,
@@ -31,4 +29,4 @@ plt.title('PCA Clustering')
 plt.savefig('PCA_Clustering2.png')
 plt.show()
 
-print(pca.explained_variance_ratio_)
\ No newline at end of file
+print(pca[-1].explained_variance_ratio_)
\ No newline at end of file
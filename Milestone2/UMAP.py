@@ -1,18 +1,14 @@
-import numpy as np
-import pandas as pd
-from sklearn.decomposition import KernelPCA
-from sklearn.preprocessing import StandardScaler
-import umap
 import matplotlib.pyplot as plt
+from data_access import read_stage
+from feature_store import load_or_build
+from projection import project
 
-cluster_DF = pd.read_parquet('data/21-25player_clusters.parquet')
-X = cluster_DF[['FG2Target','FG2_PCT','AVG_2_DIST', 'FG3Target','FG3_PCT','AVG_3_DIST', 'DREB','BLK','PF','STL',]]
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
-reducer = umap.UMAP(n_components=2)
-transformed_data = reducer.fit_transform(X)
-cluster_DF['UMAP1'] = transformed_data[:, 0]
-cluster_DF['UMAP2'] = transformed_data[:, 1]
+cluster_DF = read_stage('projection', 'data/21-25player_clusters.parquet')
+# UMAP of the shared feature store (same row order as cluster_DF). The reducer is fitted once and
+# saved in data/projections; later runs only transform new player-seasons
+points, reducer = project(load_or_build('data/21-25player_clusters.parquet'), 'umap')
+cluster_DF['UMAP1'] = points['x'].to_numpy()
+cluster_DF['UMAP2'] = points['y'].to_numpy()
 cluster_dict = {'1. Perimeter Help': 1, '3. Perimeter On-Ball': 3,
                 '5. Interior Float': 5 ,'9. Pickpockets': 9,
                 '7. Interior Help': 7, '2. Perimeter Only': 2,
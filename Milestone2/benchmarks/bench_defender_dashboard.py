@@ -0,0 +1,35 @@
+# Compares process_defender_dashboard in Data Formatting.py with the vectorised engine.
+#   python benchmarks/bench_defender_dashboard.py --players 500 --days 150
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from common import best_of, load_script, synthetic_defender_dashboard
+from formatting_engine import aggregate_defender_dashboard, read_defender_dashboards
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--days', type=int, default=150)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data_formatting = load_script('Data Formatting.py')
+    df = synthetic_defender_dashboard(args.players, args.days)
+    print(f"{len(df)} defender dashboard rows")
+
+    legacy_time, legacy = best_of(lambda: data_formatting.process_defender_dashboard(df.copy()), args.repeat)
+    engine_time, engine = best_of(lambda: aggregate_defender_dashboard(df, min_fg3a=None), args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '23_24defender_dashboard.parquet')
+        df.to_parquet(path, index=False)
+        read_time, _ = best_of(lambda: aggregate_defender_dashboard(read_defender_dashboards(path)), args.repeat)
+
+    for column in legacy.columns:
+        np.testing.assert_allclose(engine[column].to_numpy(float), legacy[column].to_numpy(float), err_msg=column)
+    print(f"process_defender_dashboard:    {legacy_time * 1000:8.1f} ms")
+    print(f"aggregate_defender_dashboard:  {engine_time * 1000:8.1f} ms  ({legacy_time / engine_time:.1f}x)")
+    print(f"  including parquet read:      {read_time * 1000:8.1f} ms")
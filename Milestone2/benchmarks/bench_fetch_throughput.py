@@ -0,0 +1,51 @@
+# Throughput of the stats.nba.com fetchers against the local stand-in server (nba_stub_server.py),
+# for tuning concurrency and the request rate without touching the network. The response cache is
+# disabled, so every call goes to the server.
+#   python benchmarks/bench_fetch_throughput.py --games 200 --concurrency 4 8 16 --latency 0.05 --rate-429 0.02
+import argparse
+import time
+
+import common  # noqa: F401  (puts Milestone2 on sys.path)
+from nba_stub_server import StubOptions, StubServer
+from pbp_data_initial import pbp_raw
+from player_info import player_info
+from player_info_addition import player_heights
+
+
+def measure(server, name, fetch, n_requests):
+    server.reset_stats()
+    start = time.perf_counter()
+    result = fetch()
+    elapsed = time.perf_counter() - start
+    stats = server.stats
+    retried = stats['requests'] - stats['by_status'].get('200', 0)
+    print(f"{name:16s} {n_requests:6d} calls {len(result):8d} rows {elapsed:7.2f} s "
+          f"{n_requests / elapsed:7.1f} calls/s  {stats['requests']:6d} requests ({retried} refused)", flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--seasons', type=int, default=25)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[4, 8, 16])
+    parser.add_argument('--rate', type=float, default=None, help="client requests per second (default: unlimited)")
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    game_ids = [f"{22400001 + i:010d}" for i in range(args.games)]
+    seasons = list(range(2000, 2000 + args.seasons))
+    players = [1_600_000 + i for i in range(args.players)]
+    options = StubOptions(args.latency, args.jitter, args.rate_429, 0, args.error_rate)
+    with StubServer(options) as server:
+        print(f"Stand-in server at {server.base_url}: latency {args.latency}+{args.jitter} s, "
+              f"{args.rate_429:.0%} 429s, {args.error_rate:.0%} 500s")
+        for concurrency in args.concurrency:
+            client = {'base_url': server.base_url, 'cache_dir': None, 'requests_per_second': args.rate, 'backoff': 0.05}
+            print(f"-- max_concurrency={concurrency}")
+            measure(server, 'pbp_raw', lambda: pbp_raw(game_ids, concurrency, **client), len(game_ids))
+            measure(server, 'player_info', lambda: player_info(seasons, concurrency, **client), len(seasons))
+            measure(server, 'player_heights', lambda: player_heights(players, concurrency, **client), len(players))
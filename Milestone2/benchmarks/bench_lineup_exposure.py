@@ -0,0 +1,25 @@
+# Compares process_play_by_play in Data Formatting.py with the single-pass lineup aggregation.
+#   python benchmarks/bench_lineup_exposure.py --games 1230
+import argparse
+
+import pandas as pd
+
+from common import best_of, load_script, synthetic_play_by_play
+from formatting_engine import aggregate_lineup_exposure
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=1230)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data_formatting = load_script('Data Formatting.py')
+    pbp_df = synthetic_play_by_play(args.games)
+    print(f"{len(pbp_df)} play-by-play rows")
+
+    legacy_time, legacy = best_of(lambda: data_formatting.process_play_by_play(pbp_df.copy()), args.repeat)
+    engine_time, engine = best_of(lambda: aggregate_lineup_exposure(pbp_df), args.repeat)
+
+    pd.testing.assert_frame_equal(engine, legacy.reset_index(drop=True), check_dtype=False)
+    print(f"process_play_by_play:       {legacy_time * 1000:8.1f} ms")
+    print(f"aggregate_lineup_exposure:  {engine_time * 1000:8.1f} ms  ({legacy_time / engine_time:.1f}x)")
@@ -0,0 +1,128 @@
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+MILESTONE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MILESTONE_DIR)
+
+
+def load_script(filename):
+    # Imports one of the Milestone2 scripts whose file name is not a valid module name,
+    # e.g. load_script('Data Formatting.py')
+    path = os.path.join(MILESTONE_DIR, filename)
+    name = os.path.splitext(filename)[0].lower().replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_of(fn, repeat=5):
+    # Best wall time in seconds over `repeat` calls, and the last result
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(fn):
+    # Peak bytes allocated (Python objects and numpy/pandas buffers) while fn runs, and its result
+    tracemalloc.start()
+    try:
+        result = fn()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+def season_list(n_seasons, last='2024-25'):
+    # n_seasons consecutive seasons ending with `last`: season_list(2) -> ['2023-24', '2024-25']
+    end = int(last[:4])
+    return [f"{year}-{(year + 1) % 100:02d}" for year in range(end - n_seasons + 1, end + 1)]
+
+
+def synthetic_defender_dashboard(n_players=500, n_days=150, seed=0):
+    # Shaped like the daily closest-defender dashboards: one row per player, distance range and day
+    from formatting_engine import DIST_RANGE_FEET
+    rng = np.random.default_rng(seed)
+    n = n_players * len(DIST_RANGE_FEET) * n_days
+    fg2a = rng.poisson(3, n)
+    fg3a = rng.poisson(2, n)
+    return pd.DataFrame({
+        'PLAYER_ID': np.repeat(np.arange(1_600_000, 1_600_000 + n_players), len(DIST_RANGE_FEET) * n_days),
+        'CLOSE_DEF_DIST_RANGE': np.tile(list(DIST_RANGE_FEET), n_players * n_days),
+        'FG2M': rng.binomial(fg2a, 0.5).astype(float),
+        'FG2A': fg2a.astype(float),
+        'FG3M': rng.binomial(fg3a, 0.35).astype(float),
+        'FG3A': fg3a.astype(float),
+        'GP': np.ones(n),
+        'G': np.ones(n),
+    })
+
+
+def synthetic_play_by_play(n_games=1230, events_per_game=450, events_per_stint=12, seed=0):
+    # Shaped like the combined play-by-play files: lineups as comma-joined player names that change
+    # every few events, possession flags and shot values. 1230 games is one regular season.
+    rng = np.random.default_rng(seed)
+    n_teams, roster_size = 30, 13
+    teams = [f"T{t:02d}" for t in range(n_teams)]
+    rosters = np.arange(n_teams * roster_size).reshape(n_teams, roster_size)
+    names = np.array([f"Player {p:03d}" for p in range(n_teams * roster_size)], dtype=object)
+
+    n_stints = -(-events_per_game // events_per_stint)
+    home_team = rng.integers(0, n_teams, n_games)
+    away_team = (home_team + rng.integers(1, n_teams, n_games)) % n_teams
+
+    def stint_lineups(team_per_game):
+        # five distinct roster spots per stint, favouring the first names on the roster
+        keys = rng.random((n_games * n_stints, roster_size)) * np.linspace(1, 3, roster_size)
+        spots = np.argsort(keys, axis=1)[:, :5]
+        players = rosters[np.repeat(team_per_game, n_stints)[:, None], spots]
+        return np.array([', '.join(names[row]) for row in players], dtype=object)
+
+    def per_event(stint_values):
+        return np.repeat(stint_values.reshape(n_games, n_stints), events_per_stint, axis=1)[:, :events_per_game].ravel()
+
+    n = n_games * events_per_game
+    poss_home = rng.integers(0, 2, n)
+    shot = rng.random(n) < 0.4
+    desc_value = np.where(shot, np.where(rng.random(n) < 0.4, 3, 2), 0)
+    shot_pts = np.where(shot & (rng.random(n) < 0.47), desc_value, 0)
+    return pd.DataFrame({
+        'game_id': np.repeat(22400001 + np.arange(n_games), events_per_game),
+        'team_home': np.repeat(np.array(teams, dtype=object)[home_team], events_per_game),
+        'team_away': np.repeat(np.array(teams, dtype=object)[away_team], events_per_game),
+        'lineup_home': per_event(stint_lineups(home_team)),
+        'lineup_away': per_event(stint_lineups(away_team)),
+        'poss_home': poss_home,
+        'poss_away': 1 - poss_home,
+        'desc_value': desc_value,
+        'shot_pts': shot_pts,
+        'shot_pts_home': np.where(poss_home == 1, shot_pts, 0),
+        'shot_pts_away': np.where(poss_home == 0, shot_pts, 0),
+    })
+
+
+def synthetic_merged_stats(n_seasons=4, players_per_season=450, n_clusters=9, seed=0):
+    # Shaped like <yy_yy>merged_player_stats.parquet / the clusters file: one row per player-season
+    # with the clustering inputs, drawn around n_clusters centres so Ward has structure to find
+    from data_access import FEATURES, STAGE_COLUMNS
+    rng = np.random.default_rng(seed)
+    n = n_seasons * players_per_season
+    centres = rng.normal(size=(n_clusters, len(FEATURES)))
+    values = centres[rng.integers(0, n_clusters, n)] + rng.normal(scale=0.5, size=(n, len(FEATURES)))
+    df = pd.DataFrame(values, columns=FEATURES)
+    df.insert(0, 'player_name', [f"Player {p:04d}" for p in np.tile(np.arange(players_per_season), n_seasons)])
+    df.insert(1, 'SEASON', np.repeat(season_list(n_seasons), players_per_season))
+    df.insert(2, 'PLAYER_ID', np.tile(np.arange(1_600_000, 1_600_000 + players_per_season), n_seasons))
+    for column in STAGE_COLUMNS['clustering']:
+        if column not in df.columns:
+            df[column] = rng.random(n)
+    return df
@@ -0,0 +1,23 @@
+import pytest
+
+# Options and the peak memory table for test_benchmarks.py
+PEAK_MEMORY = []
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-seasons', type=int, nargs='*', default=None,
+                     help="season scales to benchmark (default: 1, 4 and 20)")
+
+
+@pytest.fixture(scope='session')
+def peak_memory_report():
+    return PEAK_MEMORY
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not PEAK_MEMORY:
+        return
+    terminalreporter.section('peak memory')
+    terminalreporter.write_line(f"{'stage':28s} {'seasons':>7s} {'rows':>10s} {'peak MB':>9s}")
+    for name, n_seasons, rows, peak_mb in PEAK_MEMORY:
+        terminalreporter.write_line(f"{name:28s} {n_seasons:7d} {rows:10d} {peak_mb:9.1f}")
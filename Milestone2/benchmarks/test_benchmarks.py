@@ -0,0 +1,157 @@
+# Offline benchmark suite (pytest-benchmark) for the formatting, clustering and similarity hot
+# paths, on synthetic data shaped like the real play-by-play, defender-dashboard and merged-stats
+# files at 1, 4 and 20 seasons. pytest-benchmark reports the wall time of each stage and keeps the
+# saved runs as baselines; the peak memory of each stage (tracemalloc, measured in a separate run)
+# is printed after the timings and saved with each run's extra_info. Play-by-play is written to
+# one parquet file per season and read back and aggregated season by season, like
+# merged_stats.build_season does, so 20 seasons (11M rows) never have to fit in memory at once.
+#   cd Milestone2
+#   python -m pytest benchmarks                                    # every stage at 1, 4 and 20 seasons
+#   python -m pytest benchmarks --bench-seasons 1 -k "ward or similarity"
+#   python -m pytest benchmarks --benchmark-save=baseline          # record this machine's numbers
+#   python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=min:25%   # fail on a regression
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common import (load_script, peak_memory, synthetic_defender_dashboard, synthetic_merged_stats,
+                    synthetic_play_by_play)
+
+SCALES = [1, 4, 20]
+# the pre-vectorised functions in Data Formatting.py take minutes beyond this many seasons
+LEGACY_MAX_SEASONS = 4
+SIMILARITY_QUERIES = 1000
+ROUNDS = 3
+
+
+class Bench:
+    # setup(data) -> arguments for run, built outside the timed region
+    def __init__(self, name, data, setup, run, max_seasons=None):
+        self.name = name
+        self.data = data
+        self.setup = setup
+        self.run = run
+        self.max_seasons = max_seasons
+
+
+class SyntheticData:
+    # Generates each dataset once and shares it between stages. get() returns (data, rows); for
+    # play-by-play the data is a list of per-season parquet files in a temporary directory, and
+    # season i's file is reused at every scale
+    def __init__(self):
+        self.cache = {}
+        self.tmp_dir = tempfile.mkdtemp(prefix='bench_')
+
+    def close(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def season_file(self, kind, season):
+        path = os.path.join(self.tmp_dir, f"{kind}_{season}.parquet")
+        if not os.path.exists(path):
+            pbp_df = synthetic_play_by_play(n_games=1230, seed=season)
+            if kind == 'play_by_play_ids':
+                pbp_df = encoded_play_by_play(pbp_df)
+            pbp_df.to_parquet(path, index=False)
+            self.cache[(kind, 'rows', season)] = len(pbp_df)
+        return path, self.cache[(kind, 'rows', season)]
+
+    def get(self, kind, n_seasons):
+        if kind in ('play_by_play', 'play_by_play_ids'):
+            files = [self.season_file(kind, season) for season in range(n_seasons)]
+            return [path for path, _ in files], sum(rows for _, rows in files)
+        key = (kind, n_seasons)
+        if key not in self.cache:
+            # only one scale of the in-memory datasets is kept at a time
+            self.cache = {k: v for k, v in self.cache.items() if k[1] in ('rows', n_seasons)}
+            if kind == 'defender_dashboard':
+                self.cache[key] = synthetic_defender_dashboard(n_players=500, n_days=150 * n_seasons)
+            elif kind == 'merged_stats':
+                self.cache[key] = synthetic_merged_stats(n_seasons)
+        return self.cache[key], len(self.cache[key])
+
+
+def encoded_play_by_play(pbp_df):
+    from lineup_encoding import encode_lineups
+    names = pd.unique(np.concatenate([pbp_df['lineup_home'].str.split(', ').explode().unique(),
+                                      pbp_df['lineup_away'].str.split(', ').explode().unique()]))
+    dictionary = pd.DataFrame({'player_name': names, 'PLAYER_ID': np.arange(1, len(names) + 1, dtype=np.int32)})
+    columns = ['poss_home', 'poss_away', 'desc_value', 'shot_pts', 'lineup_home', 'lineup_away']
+    return encode_lineups(pbp_df[columns].copy(), dictionary)[0].drop(columns=['lineup_home', 'lineup_away'])
+
+
+def standardised(df):
+    from feature_store import FeatureStore
+    return FeatureStore.build(df).matrix
+
+
+def similarity_queries(index):
+    rows = np.random.default_rng(0).integers(0, len(index), SIMILARITY_QUERIES)
+    for row in rows:
+        index.query(index.vectors[row], k=4)
+
+
+def benches():
+    from clustering import cut_labels, k_sweep, ward_linkage
+    from data_access import read_stage
+    from formatting_engine import aggregate_defender_dashboard, aggregate_lineup_exposure, aggregate_lineup_exposure_by_id
+    from similarity_index import SimilarityIndex
+
+    data_formatting = load_script('Data Formatting.py')
+
+    def per_season(aggregate, read=lambda path: read_stage('lineup_exposure', path)):
+        return lambda paths: [aggregate(read(path)) for path in paths]
+
+    def sklearn_ward(X):
+        from sklearn.cluster import AgglomerativeClustering
+        return AgglomerativeClustering(linkage='ward', n_clusters=9).fit_predict(X)
+
+    def same(data):
+        return data
+
+    return [
+        Bench('defender_dashboard.legacy', 'defender_dashboard', same,
+              lambda df: data_formatting.process_defender_dashboard(df.copy()), LEGACY_MAX_SEASONS),
+        Bench('defender_dashboard.engine', 'defender_dashboard', same, aggregate_defender_dashboard),
+        # Data Formatting.py read the whole file with pd.read_parquet
+        Bench('play_by_play.legacy', 'play_by_play', same,
+              per_season(data_formatting.process_play_by_play, pd.read_parquet), LEGACY_MAX_SEASONS),
+        Bench('play_by_play.engine', 'play_by_play', same, per_season(aggregate_lineup_exposure)),
+        Bench('play_by_play.by_id', 'play_by_play_ids', same, per_season(aggregate_lineup_exposure_by_id)),
+        Bench('ward.sklearn', 'merged_stats', standardised, sklearn_ward),
+        Bench('ward.linkage', 'merged_stats', standardised, lambda X: cut_labels(ward_linkage(X, cache_dir=None), 9)),
+        Bench('ward.k_sweep', 'merged_stats', standardised, lambda X: k_sweep(X, range(2, 21), cache_dir=None)),
+        # SIMILARITY_QUERIES queries per round
+        Bench('similarity.query', 'merged_stats', SimilarityIndex.build, similarity_queries),
+        Bench('similarity.all_neighbours', 'merged_stats', SimilarityIndex.build,
+              lambda index: index.all_neighbours(k=3)),
+    ]
+
+
+@pytest.fixture(scope='session')
+def synthetic_data():
+    data = SyntheticData()
+    yield data
+    data.close()
+
+
+def pytest_generate_tests(metafunc):
+    if 'bench' in metafunc.fixturenames:
+        cases = [pytest.param(bench, n_seasons, id=f"{bench.name}@{n_seasons}")
+                 for n_seasons in metafunc.config.getoption('bench_seasons') or SCALES for bench in benches()
+                 if bench.max_seasons is None or n_seasons <= bench.max_seasons]
+        metafunc.parametrize('bench, n_seasons', cases)
+
+
+def test_stage(benchmark, synthetic_data, peak_memory_report, bench, n_seasons):
+    source, rows = synthetic_data.get(bench.data, n_seasons)
+    arg = bench.setup(source)
+    # the traced run doubles as a warm-up (imports, first-call caches) for the timed ones
+    peak, _ = peak_memory(lambda: bench.run(arg))
+    peak_memory_report.append((bench.name, n_seasons, rows, peak / 2**20))
+    benchmark.group = f"{n_seasons} seasons"
+    benchmark.extra_info.update({'seasons': n_seasons, 'rows': rows, 'peak_mb': peak / 2**20})
+    benchmark.pedantic(bench.run, args=(arg,), rounds=ROUNDS, iterations=1)
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+from heapq import heappush, heappushpop
+
+import numpy as np
+import pandas as pd
+from scipy.cluster import hierarchy
+from scipy.optimize import linear_sum_assignment
+from sklearn.metrics import pairwise_distances, silhouette_score
+
+from data_access import FEATURES, read_stage
+from feature_store import KEY_COLUMNS, STORE_DIR, FeatureStore, file_digest, row_hashes
+from merged_stats import SEASONS, season_paths
+
+# Non-interactive version of the Clustering Dendogram.py flow, used by pipeline.py.
+# The Ward linkage is computed once per feature matrix and cached on disk; labels for any number
+# of clusters, k sweeps and dendrograms are all cut from that one linkage.
+# A full refit stores each cluster's name, centroid and size in MODEL_PATH. Daily updates only
+# assign new or changed player-seasons to the stored clusters, and a refit hands the stored names
+# on to the closest new clusters, so a name keeps meaning the same group across runs.
+LINKAGE_CACHE_DIR = 'data/linkage_cache'
+MODEL_PATH = 'data/cluster_model.json'
+CLUSTERS_PATH = 'data/21-25player_clusters.parquet'
+HEATMAP_PATH = '21-25data.png'
+N_CLUSTERS = 9
+
+#Rename cluster for context
+CLUSTER_NAMES = {0: '1. Perimeter Help', 1: '3. Perimeter On-Ball',
+                 2: '5. Interior Float', 3: '9. Pickpockets',
+                 4: '7. Interior Help', 5: '2. Perimeter Only',
+                 6: '6. Interior Paint', 7: '4. Interior Risk Averse',
+                 8: '8. Interior Close Out'}
+
+# Features where a lower value means a more active defender; flipped for the heatmap
+FLIPPED_FEATURES = ['AVG_2_DIST', 'AVG_3_DIST', 'FG2_PCT', 'FG3_PCT', 'PF', 'FG2Target', 'FG3Target']
+
+
+def load_merged_stats(seasons=SEASONS, data_dir='data'):
+    frames = []
+    for season in seasons:
+        season_df = read_stage('clustering', season_paths(season, data_dir)['output'])
+        season_df['SEASON'] = season
+        frames.append(season_df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def prepare_features(df, fg3_pct_fill=None):
+    #Players who did not have a high enough 3pt attempt rate were given the average 3pt percentage
+    #(an update passes the average saved with the cluster model, so adding a season does not shift
+    #the imputed value, and with it the features, of every earlier player-season)
+    avg_fg3_pct = df['FG3_PCT'].mean() if fg3_pct_fill is None else fg3_pct_fill
+    df.loc[df['FG3Target'] < 0.025, 'FG3_PCT'] = avg_fg3_pct
+    df.loc[df['FG3_PCT'] == 0, 'FG3_PCT'] = avg_fg3_pct
+    #A Player's arm length is estimated using half of (their wingspan - .25 of their height without shoes ~ chest length)
+    df['AVG_2_DIST'] = df['AVG_2_DEF_DIST'] - ((df['WINGSPAN']-(df['HEIGHT_WO_SHOES']/48))/24)
+    df['AVG_3_DIST'] = df['AVG_3_DEF_DIST'] - ((df['WINGSPAN']-(df['HEIGHT_WO_SHOES']/48))/24)
+    return df
+
+
+def matrix_key(X):
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    return hashlib.sha256(str(X.shape).encode() + X.tobytes()).hexdigest()
+
+
+def ward_linkage(X, cache_dir=LINKAGE_CACHE_DIR):
+    # scipy linkage matrix (the same tree AgglomerativeClustering(linkage='ward') builds)
+    path = os.path.join(cache_dir, f"{matrix_key(X)}.npy") if cache_dir else None
+    if path and os.path.exists(path):
+        return np.load(path)
+    Z = hierarchy.ward(np.asarray(X, dtype=np.float64))
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, Z)
+        os.replace(tmp_path, path)
+    return Z
+
+
+def cut_labels(Z, n_clusters):
+    # Flat clusters from a linkage, numbered exactly like AgglomerativeClustering.fit_predict so
+    # CLUSTER_NAMES keeps pointing at the same groups
+    n_leaves = len(Z) + 1
+    children = Z[:, :2].astype(np.intp)
+    nodes = [-(n_leaves + len(Z) - 1)]
+    for _ in range(n_clusters - 1):
+        these_children = children[-nodes[0] - n_leaves]
+        heappush(nodes, -these_children[0])
+        heappushpop(nodes, -these_children[1])
+    node_labels = np.full(n_leaves + len(Z), -1, dtype=np.intp)
+    node_labels[[-node for node in nodes]] = np.arange(len(nodes))
+    # parents always have larger ids than their children, so walk the merges from the root down
+    for i in range(len(Z) - 1, -1, -1):
+        label = node_labels[n_leaves + i]
+        for child in children[i]:
+            if node_labels[child] < 0:
+                node_labels[child] = label
+    return node_labels[:n_leaves]
+
+
+def render_dendrogram(Z, path, title="Hierarchical Clustering Dendrogram", threshold=None, **kwargs):
+    # Headless: draws on a bare Agg figure (no pyplot, no plt.show) and writes PNG or SVG
+    # depending on the extension of path
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    kwargs = {'truncate_mode': 'level', 'p': 4, 'orientation': 'left', **kwargs}
+    fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title(title)
+    hierarchy.dendrogram(Z, ax=ax, **kwargs)
+    ax.set_xlabel("Number of points in node (or index of point if no parenthesis).")
+    if threshold is not None:
+        ax.axvline(x=threshold, color='black', linestyle='--', label='threshold')
+        ax.legend(loc='upper left')
+    fig.savefig(path, dpi=300)
+    return path
+
+
+def fit_clusters(X, n_clusters=N_CLUSTERS, cache_dir=LINKAGE_CACHE_DIR):
+    return cut_labels(ward_linkage(X, cache_dir), n_clusters)
+
+
+def k_sweep(X, ks=range(2, 21), cache_dir=LINKAGE_CACHE_DIR):
+    # Silhouette score and distortion (within-cluster sum of squares, what KElbowVisualizer plots)
+    # for every k, all cut from one linkage and one pairwise distance matrix
+    X = np.asarray(X, dtype=np.float64)
+    Z = ward_linkage(X, cache_dir)
+    distances = pairwise_distances(X)
+    rows = []
+    for k in ks:
+        labels = cut_labels(Z, k)
+        centroids = np.array([X[labels == label].mean(axis=0) for label in range(k)])
+        distortion = ((X - centroids[labels]) ** 2).sum()
+        rows.append({'k': k, 'silhouette': silhouette_score(distances, labels, metric='precomputed'),
+                     'distortion': distortion})
+    return pd.DataFrame(rows)
+
+
+def cluster_averages(X, labels):
+    X_df = pd.DataFrame(X, columns=FEATURES)
+    X_df[FLIPPED_FEATURES] = -1*X_df[FLIPPED_FEATURES]
+    X_df['Cluster_Labels'] = labels
+    return X_df.groupby('Cluster_Labels').mean()
+
+
+def save_cluster_heatmap(averages, path=HEATMAP_PATH):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    grid = sns.clustermap(averages, z_score=1, cmap='vlag', row_cluster=False, col_cluster=False)
+    grid.savefig(path, dpi=300)
+    plt.close(grid.fig)
+
+
+def centroids_and_sizes(X, labels, n_clusters):
+    X = np.asarray(X, dtype=np.float64)
+    sizes = np.bincount(labels, minlength=n_clusters)
+    sums = np.zeros((n_clusters, X.shape[1]))
+    np.add.at(sums, labels, X)
+    return sums / np.maximum(sizes, 1)[:, None], sizes
+
+
+def load_cluster_model(path=MODEL_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cluster_model(model, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(model, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def cluster_model(store, labels, names, fg3_pct_fill):
+    centroids, sizes = centroids_and_sizes(store.matrix, labels, len(names))
+    return {'columns': store.columns, 'mean': store.mean.tolist(), 'scale': store.scale.tolist(),
+            'names': list(names), 'centroids': centroids.tolist(), 'sizes': sizes.tolist(),
+            'fg3_pct_fill': fg3_pct_fill}
+
+
+def match_cluster_names(store, centroids, previous=None):
+    # Names for freshly fitted clusters: CLUSTER_NAMES on the first fit, afterwards the name of
+    # the previous cluster whose centroid is closest (one-to-one), so a refit that only reorders
+    # sklearn's label numbers keeps every name on the same group
+    n_clusters = len(centroids)
+    if previous is None or previous['columns'] != store.columns:
+        return [CLUSTER_NAMES.get(i, f'Cluster {i + 1}') for i in range(n_clusters)]
+    previous_raw = np.asarray(previous['centroids']) * np.asarray(previous['scale']) + np.asarray(previous['mean'])
+    previous_centroids = (previous_raw - store.mean) / store.scale
+    cost = ((centroids[:, None, :] - previous_centroids[None, :, :]) ** 2).sum(axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    names = [f'Cluster {i + 1}' for i in range(n_clusters)]
+    for row, col in zip(rows, cols):
+        names[row] = previous['names'][col]
+    return names
+
+
+def assign_clusters(values, model):
+    # Cluster names for raw feature rows (in model['columns'] order), O(rows x clusters): each row
+    # joins the cluster whose Ward merge cost, size / (size + 1) * squared distance to the
+    # centroid, is lowest
+    X = (np.asarray(values, dtype=np.float64) - np.asarray(model['mean'])) / np.asarray(model['scale'])
+    centroids = np.asarray(model['centroids'])
+    sizes = np.asarray(model['sizes'], dtype=np.float64)
+    sq_distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+    cost = sizes / (sizes + 1) * np.maximum(sq_distances, 0)
+    return np.asarray(model['names'], dtype=object)[cost.argmin(axis=1)]
+
+
+def save_clusters(df, store, output, store_dir, heatmap):
+    df.to_parquet(output, index=False)
+    # the feature store is versioned by the clusters file it describes
+    store.version = file_digest(output)
+    store.save(store_dir)
+    if heatmap:
+        save_cluster_heatmap(cluster_averages(store.matrix, df['Cluster_Labels'].to_numpy()), heatmap)
+
+
+def build_player_clusters(seasons=SEASONS, data_dir='data', output=CLUSTERS_PATH, heatmap=HEATMAP_PATH,
+                          n_clusters=N_CLUSTERS, dendrogram=None, store_dir=STORE_DIR, model_path=MODEL_PATH):
+    # Full refit: Ward clustering of every player-season
+    df = load_merged_stats(seasons, data_dir)
+    fg3_pct_fill = float(df['FG3_PCT'].mean())
+    df = prepare_features(df, fg3_pct_fill)
+    store = FeatureStore.build(df)
+    X = store.matrix
+    Z = ward_linkage(X, os.path.join(data_dir, os.path.basename(LINKAGE_CACHE_DIR)))
+    labels = cut_labels(Z, n_clusters)
+    centroids, _ = centroids_and_sizes(X, labels, n_clusters)
+    names = match_cluster_names(store, centroids, load_cluster_model(model_path))
+    df['Cluster_Labels'] = np.asarray(names, dtype=object)[labels]
+    save_clusters(df, store, output, store_dir, heatmap)
+    save_cluster_model(cluster_model(store, labels, names, fg3_pct_fill), model_path)
+    if dendrogram:
+        render_dendrogram(Z, dendrogram, threshold=20)
+    print(f"Saved {len(df)} player-seasons in {df['Cluster_Labels'].nunique()} clusters to {output}")
+    return output
+
+
+def update_player_clusters(seasons=SEASONS, data_dir='data', output=CLUSTERS_PATH, heatmap=HEATMAP_PATH,
+                           store_dir=STORE_DIR, model_path=MODEL_PATH, refit=False):
+    # Assign-only update: player-seasons already in output with unchanged features keep their
+    # cluster, new or changed ones are assigned to the stored clusters. Falls back to a full refit
+    # when asked to, or when there is no stored model (or one saved without its FG3_PCT fill) or
+    # clusters file yet
+    model = load_cluster_model(model_path)
+    if (refit or model is None or model['columns'] != FEATURES or 'fg3_pct_fill' not in model
+            or not os.path.exists(output)):
+        return build_player_clusters(seasons, data_dir, output, heatmap, len(model['names']) if model else N_CLUSTERS,
+                                     store_dir=store_dir, model_path=model_path)
+    df = prepare_features(load_merged_stats(seasons, data_dir), model['fg3_pct_fill'])
+    store = FeatureStore.build(df)
+    values = df[FEATURES].to_numpy(dtype=np.float64)
+
+    previous = pd.read_parquet(output, columns=KEY_COLUMNS + FEATURES + ['Cluster_Labels'])
+    previous['row_hash'] = row_hashes(previous[FEATURES].to_numpy(dtype=np.float64))
+    previous = previous.drop(columns=FEATURES).drop_duplicates(subset=KEY_COLUMNS, keep='last')
+    labels = df[KEY_COLUMNS].assign(row_hash=store.row_hash).merge(
+        previous, on=KEY_COLUMNS + ['row_hash'], how='left')['Cluster_Labels'].to_numpy(dtype=object)
+    new = pd.isna(labels)
+    labels[new] = assign_clusters(values[new], model)
+    df['Cluster_Labels'] = labels
+    save_clusters(df, store, output, store_dir, heatmap)
+    print(f"Kept {int((~new).sum())} and assigned {int(new.sum())} player-seasons to the stored clusters in {output}")
+    return output
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seasons', nargs='*', default=SEASONS)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--clusters', type=int, default=N_CLUSTERS)
+    parser.add_argument('--dendrogram', default=None, help="also write the dendrogram to this .png/.svg file")
+    parser.add_argument('--assign', action='store_true',
+                        help="only assign new or changed player-seasons to the stored clusters (full refit if there are none)")
+    args = parser.parse_args()
+    if args.assign:
+        update_player_clusters(args.seasons, args.data_dir)
+    else:
+        build_player_clusters(args.seasons, args.data_dir, n_clusters=args.clusters, dendrogram=args.dendrogram)
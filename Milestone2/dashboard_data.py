@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_access import read_schema, read_stage, read_table, stage_columns
+
+# Small tables the dashboard callbacks answer from, computed once from the clusters/positions
+# frame instead of filtering the whole frame on every callback.
+ALL_SEASONS = 'All seasons'
+SHARED_TABLE_PATH = 'data/dashboard_table.arrow'
+SIMILAR_PLAYERS_PATH = 'data/similar_players.parquet'
+SIMILAR_COLUMNS = ['player_name', 'SEASON', 'Cluster_Labels', 'FG2_PCT', 'FG2Target', 'FG3_PCT', 'FG3Target',
+                   'DREB', 'STL', 'BLK', 'PF']
+PERCENT_COLUMNS = ['FG2_PCT', 'FG2Target', 'FG3_PCT', 'FG3Target']
+N_SIMILAR = 3
+
+
+def shared_frame(source, path=SHARED_TABLE_PATH):
+    # The dashboard columns of source, kept as an uncompressed Arrow IPC file and read back
+    # memory-mapped: numeric columns without nulls stay backed by the OS page cache, so every
+    # gunicorn worker maps the same pages instead of holding its own copy. Rows are in source order.
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+        table = read_table(source, stage_columns('dashboard', read_schema(source)))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    # the buffers keep the mapping alive, so it is not closed here
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all().to_pandas(split_blocks=True)
+
+
+def position_distributions(df):
+    # Share of each position (in percent) for every cluster, over all seasons (SEASON = ALL_SEASONS)
+    # and per season: SEASON, Cluster_Labels, POSITION, PERCENT, largest share first within each
+    # selection like value_counts(normalize=True). Players without a position are left out.
+    per_season = df.groupby(['SEASON', 'Cluster_Labels', 'positions']).size()
+    overall = df.groupby(['Cluster_Labels', 'positions']).size()
+    overall = pd.concat({ALL_SEASONS: overall}, names=['SEASON'])
+    counts = pd.concat([overall, per_season]).rename('COUNT').reset_index().rename(columns={'positions': 'POSITION'})
+    totals = counts.groupby(['SEASON', 'Cluster_Labels'])['COUNT'].transform('sum')
+    counts['PERCENT'] = counts['COUNT'] / totals * 100
+    counts = counts.sort_values(['SEASON', 'Cluster_Labels', 'COUNT'], ascending=[True, True, False], kind='stable')
+    return counts[['SEASON', 'Cluster_Labels', 'POSITION', 'PERCENT']].reset_index(drop=True)
+
+
+def distribution_lookup(distributions):
+    # {(season, cluster): (positions, percents)} so a selection is a dictionary lookup
+    return {key: (tuple(group['POSITION']), tuple(group['PERCENT']))
+            for key, group in distributions.groupby(['SEASON', 'Cluster_Labels'], sort=False)}
+
+
+def similar_players_table(df, index, k=N_SIMILAR):
+    # Every row of df followed by its k nearest player-seasons (SimilarityIndex.all_neighbours),
+    # as k + 1 consecutive rows per player-season in df order, with the display columns already
+    # formatted as strings. Row r's block is rows r * (k + 1) to (r + 1) * (k + 1).
+    neighbours, distances = index.all_neighbours(k)
+    k = neighbours.shape[1]
+    rows = np.column_stack([np.arange(len(df)), neighbours]).ravel()
+    values = df[SIMILAR_COLUMNS].iloc[rows].reset_index(drop=True)
+    table = pd.DataFrame({'row': np.repeat(np.arange(len(df)), k + 1), 'rank': np.tile(np.arange(k + 1), len(df)),
+                          'distance': np.column_stack([np.zeros(len(df)), distances]).ravel()})
+    for column in SIMILAR_COLUMNS:
+        if column in PERCENT_COLUMNS:
+            table[column] = np.char.mod('%.2f%%', values[column].to_numpy(dtype=np.float64) * 100)
+        else:
+            table[column] = values[column].astype(str).to_numpy()
+    return table
+
+
+def similar_players(df, index, path=SIMILAR_PLAYERS_PATH, k=N_SIMILAR):
+    # The table above, saved as Parquet and rebuilt only when the feature store version (the
+    # clusters file's digest), its row count or k changes
+    version = f"{index.store.version}:{len(df)}:{k}"
+    if os.path.exists(path) and (pq.read_schema(path).metadata or {}).get(b'version') == version.encode():
+        return pd.read_parquet(path)
+    table = similar_players_table(df, index, k)
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    arrow_table = arrow_table.replace_schema_metadata({**(arrow_table.schema.metadata or {}), b'version': version.encode()})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(arrow_table, tmp_path)
+    os.replace(tmp_path, path)
+    return table
+
+
+def build_similar_players(source, path=SIMILAR_PLAYERS_PATH, k=N_SIMILAR):
+    from similarity_index import load_or_build
+    return similar_players(read_stage('dashboard', source), load_or_build(source), path, k)
@@ -0,0 +1,65 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lineup_encoding import AWAY_ID_COLUMNS, HOME_ID_COLUMNS
+
+# Single place that knows which parquet columns each stage of the pipeline uses. Reads go through
+# pyarrow with column projection, season/game filters pushed down to the row groups and memory
+# mapping, so a stage only decodes the bytes it needs.
+FEATURES = ['FG2Target', 'FG2_PCT', 'AVG_2_DIST', 'FG3Target', 'FG3_PCT', 'AVG_3_DIST', 'DREB', 'BLK', 'PF', 'STL']
+
+STAGE_COLUMNS = {
+    'defender_dashboard': ['PLAYER_ID', 'CLOSE_DEF_DIST_RANGE', 'FG2M', 'FG2A', 'FG3M', 'FG3A'],
+    # lineup strings are only read when the file has no lineup_encoding.py ID columns
+    'lineup_exposure': ['poss_home', 'poss_away', 'desc_value', 'shot_pts', 'lineup_home', 'lineup_away'],
+    'lineup_ratings': ['game_id', 'team_home', 'team_away', 'poss_home', 'poss_away', 'shot_pts_home', 'shot_pts_away',
+                       'lineup_home', 'lineup_away'],
+    'per100poss': ['PLAYER_ID', 'DREB', 'STL', 'BLK', 'PF', 'GP'],
+    'anthro': ['PLAYER_ID', 'HEIGHT_WO_SHOES', 'WINGSPAN'],
+    'player_info': ['PERSON_ID', 'DISPLAY_LAST_COMMA_FIRST', 'DISPLAY_FIRST_LAST'],
+    'clustering': ['player_name', 'SEASON', 'PLAYER_ID', 'FG2Target', 'FG2_PCT', 'AVG_2_DEF_DIST', 'FG3Target', 'FG3_PCT',
+                   'AVG_3_DEF_DIST', 'DREB', 'BLK', 'PF', 'STL', 'HEIGHT_WO_SHOES', 'WINGSPAN'],
+    # the standardised features themselves come from feature_store.py
+    'projection': ['Cluster_Labels'],
+    'dashboard': ['player_name', 'SEASON', 'PLAYER_ID', 'Cluster_Labels', 'AVG_3_DEF_DIST'] + FEATURES,
+}
+
+
+def stage_columns(stage, schema):
+    columns = STAGE_COLUMNS[stage]
+    if stage in ('lineup_exposure', 'lineup_ratings') and all(column in schema.names for column in HOME_ID_COLUMNS + AWAY_ID_COLUMNS):
+        columns = [column for column in columns if not column.startswith('lineup_')] + HOME_ID_COLUMNS + AWAY_ID_COLUMNS
+    # files written before a column existed (e.g. SEASON) just don't get it
+    return [column for column in columns if column in schema.names]
+
+
+def season_filter(schema, seasons=None, game_ids=None):
+    filters = []
+    if seasons is not None and 'SEASON' in schema.names:
+        filters.append(('SEASON', 'in', list(seasons)))
+    if game_ids is not None and 'game_id' in schema.names:
+        # game_id is stored as text in streamed files and as a number in the older ones
+        if pa.types.is_string(schema.field('game_id').type) or pa.types.is_large_string(schema.field('game_id').type):
+            game_ids = [str(int(float(game_id))).zfill(10) for game_id in game_ids]
+        else:
+            game_ids = [int(float(game_id)) for game_id in game_ids]
+        filters.append(('game_id', 'in', game_ids))
+    return filters or None
+
+
+def read_table(path, columns=None, filters=None):
+    return pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+
+
+def read_schema(path):
+    # a single file, or a directory of per-game files written by pbp_stream
+    return pq.ParquetDataset(path).schema if os.path.isdir(path) else pq.read_schema(path)
+
+
+def read_stage(stage, path, seasons=None, game_ids=None):
+    # DataFrame with only the columns `stage` uses, optionally restricted to some seasons/games
+    schema = read_schema(path)
+    table = read_table(path, stage_columns(stage, schema), season_filter(schema, seasons, game_ids))
+    return table.to_pandas()
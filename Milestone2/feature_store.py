@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_access import FEATURES, read_stage
+
+# The standardised clustering features, computed once per version of the clusters file and
+# shared by every analysis script and the dashboard: the scaler parameters and column order in
+# meta.json, the float32 matrix in matrix.npy (memory-mapped on load, so no copy and no refit)
+# and the player/season row keys in keys.parquet, in the same row order as the source file, with
+# a hash of each row's raw feature values so consumers can tell which rows changed.
+STORE_DIR = 'data/feature_store'
+SOURCE_PATH = 'data/21-25player_clusters.parquet'
+KEY_COLUMNS = ['player_name', 'SEASON', 'PLAYER_ID']
+# bump when the layout of the store changes, so old stores are rebuilt
+FORMAT_VERSION = 2
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def row_hashes(values):
+    # One uint64 per row of raw feature values
+    return pd.util.hash_pandas_object(pd.DataFrame(values), index=False).to_numpy()
+
+
+class FeatureStore:
+    def __init__(self, matrix, keys, mean, scale, columns=FEATURES, version=None, row_hash=None):
+        self.matrix = matrix
+        self.keys = keys.reset_index(drop=True)
+        self.row_hash = row_hash
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.columns = list(columns)
+        self.version = version
+
+    @classmethod
+    def build(cls, df, columns=FEATURES, version=None):
+        # Same standardisation as StandardScaler().fit_transform(df[columns])
+        values = df[columns].to_numpy(dtype=np.float64)
+        mean = values.mean(axis=0)
+        scale = values.std(axis=0)
+        scale[scale == 0] = 1
+        matrix = np.ascontiguousarray((values - mean) / scale, dtype=np.float32)
+        keys = df[[column for column in KEY_COLUMNS if column in df.columns]]
+        return cls(matrix, keys, mean, scale, columns, version, row_hashes(values))
+
+    def save(self, store_dir=STORE_DIR):
+        os.makedirs(store_dir, exist_ok=True)
+        np.save(os.path.join(store_dir, 'matrix.npy'), np.ascontiguousarray(self.matrix, dtype=np.float32))
+        self.keys.assign(row_hash=self.row_hash).to_parquet(os.path.join(store_dir, 'keys.parquet'), index=False)
+        meta = {'format_version': FORMAT_VERSION, 'version': self.version, 'columns': self.columns,
+                'mean': self.mean.tolist(), 'scale': self.scale.tolist(), 'rows': len(self.keys)}
+        # meta.json is written last, so an interrupted save is never picked up as current
+        tmp_path = os.path.join(store_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp_path, os.path.join(store_dir, 'meta.json'))
+        return store_dir
+
+    @classmethod
+    def load(cls, store_dir=STORE_DIR):
+        meta = read_meta(store_dir)
+        matrix = np.load(os.path.join(store_dir, 'matrix.npy'), mmap_mode='r')
+        keys = pd.read_parquet(os.path.join(store_dir, 'keys.parquet'))
+        row_hash = keys.pop('row_hash').to_numpy()
+        return cls(matrix, keys, meta['mean'], meta['scale'], meta['columns'], meta['version'], row_hash)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def transform(self, values):
+        # Raw feature values (in self.columns order) -> standardised float32 rows
+        return ((np.atleast_2d(np.asarray(values, dtype=np.float64)) - self.mean) / self.scale).astype(np.float32)
+
+    def inverse_transform(self, matrix):
+        return np.asarray(matrix, dtype=np.float64) * self.scale + self.mean
+
+    def frame(self):
+        # Standardised features as a DataFrame over the same buffer
+        return pd.DataFrame(self.matrix, columns=self.columns, copy=False)
+
+
+def read_meta(store_dir=STORE_DIR):
+    with open(os.path.join(store_dir, 'meta.json')) as f:
+        return json.load(f)
+
+
+def is_current(store_dir, version, columns=FEATURES):
+    if not os.path.exists(os.path.join(store_dir, 'meta.json')):
+        return False
+    meta = read_meta(store_dir)
+    return (meta.get('format_version') == FORMAT_VERSION and meta.get('version') == version
+            and meta.get('columns') == list(columns))
+
+
+def load_or_build(source=SOURCE_PATH, store_dir=STORE_DIR, columns=FEATURES):
+    # The store for the current contents of source, rebuilt and saved when source has changed
+    version = file_digest(source)
+    if not is_current(store_dir, version, columns):
+        FeatureStore.build(read_stage('dashboard', source), columns, version).save(store_dir)
+    return FeatureStore.load(store_dir)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default=SOURCE_PATH)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+    store = load_or_build(args.source, args.store_dir)
+    print(f"Feature store {args.store_dir}: {len(store)} rows x {len(store.columns)} features, version {store.version[:12]}")
@@ -0,0 +1,158 @@
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_access import STAGE_COLUMNS, read_table
+
+# Vectorised versions of the transforms in Data Formatting.py. The functions there are kept as
+# the reference implementation (see benchmarks/).
+
+# Closest-defender distance ranges, coded as the middle of the range in feet
+DIST_RANGE_FEET = {'0-2 Feet - Very Tight': 1, '2-4 Feet - Tight': 3, '4-6 Feet - Open': 5, '6+ Feet - Wide Open': 7}
+DEFENDER_COUNT_COLUMNS = ['FG2M', 'FG2A', 'FG3M', 'FG3A']
+MIN_FG3A = 25
+
+
+def season_from_path(path):
+    # data/23_24defender_dashboard.parquet -> '2023-24'
+    match = re.match(r'(\d{2})_(\d{2})', os.path.basename(path))
+    if match is None:
+        return None
+    return f"20{match.group(1)}-{match.group(2)}"
+
+
+def read_defender_dashboards(paths):
+    # paths: one file, a list of files or a glob such as 'data/*defender_dashboard.parquet'.
+    # Only the needed columns are read, counts are cast to int32 and the distance range is
+    # dictionary encoded once in Arrow, so pandas sees compact dtypes from the start.
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths)) if glob.has_magic(paths) else [paths]
+    tables = []
+    for path in paths:
+        table = read_table(path, columns=STAGE_COLUMNS['defender_dashboard'])
+        columns = {
+            'SEASON': pa.array([season_from_path(path)] * len(table), pa.string()).dictionary_encode(),
+            'PLAYER_ID': pc.cast(table['PLAYER_ID'], pa.int64()),
+            'CLOSE_DEF_DIST_RANGE': pc.cast(table['CLOSE_DEF_DIST_RANGE'], pa.string()).dictionary_encode(),
+        }
+        for column in DEFENDER_COUNT_COLUMNS:
+            columns[column] = pc.cast(table[column], pa.int32())
+        tables.append(pa.table(columns))
+    return pa.concat_tables(tables).to_pandas()
+
+
+def aggregate_defender_dashboard(df, min_fg3a=MIN_FG3A):
+    # Same output columns as process_defender_dashboard, aggregated per SEASON and PLAYER_ID in a
+    # single pass. Players under min_fg3a three point attempts get FG3_PCT 0.5
+    # (min_fg3a=None keeps the raw FG3M/FG3A ratio).
+    ranges = df['CLOSE_DEF_DIST_RANGE'].astype('category')
+    unknown = set(ranges.cat.categories) - set(DIST_RANGE_FEET)
+    if unknown:
+        raise ValueError(f"Unknown CLOSE_DEF_DIST_RANGE values: {sorted(unknown)}")
+    feet = np.array([DIST_RANGE_FEET[c] for c in ranges.cat.categories], dtype=np.int32)[ranges.cat.codes.to_numpy()]
+
+    # Group ids from factorised keys, then one np.bincount per summed column
+    player_codes, players = pd.factorize(df['PLAYER_ID'], sort=True)
+    if 'SEASON' in df.columns:
+        season_codes, seasons = pd.factorize(df['SEASON'].astype(str), sort=True)
+    else:
+        season_codes, seasons = np.zeros(len(df), dtype=np.intp), None
+    group_codes, groups = pd.factorize(season_codes * len(players) + player_codes, sort=True)
+    n_groups = len(groups)
+
+    agg_df = pd.DataFrame({'PLAYER_ID': players[groups % len(players)]})
+    if seasons is not None:
+        agg_df.insert(0, 'SEASON', seasons[groups // len(players)])
+    fg2a_rows = df['FG2A'].to_numpy(np.int64)
+    fg3a_rows = df['FG3A'].to_numpy(np.int64)
+    for column, values in [('FG2M', df['FG2M'].to_numpy(np.int64)), ('FG2A', fg2a_rows),
+                           ('FG3M', df['FG3M'].to_numpy(np.int64)), ('FG3A', fg3a_rows),
+                           ('TOT_DIST_2', feet * fg2a_rows), ('TOT_DIST_3', feet * fg3a_rows)]:
+        agg_df[column] = np.bincount(group_codes, weights=values, minlength=n_groups).astype(np.int64)
+
+    fg2m, fg2a = agg_df['FG2M'].to_numpy(), agg_df['FG2A'].to_numpy()
+    fg3m, fg3a = agg_df['FG3M'].to_numpy(), agg_df['FG3A'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fg3_pct = fg3m / fg3a
+        if min_fg3a is not None:
+            fg3_pct = np.where(fg3a >= min_fg3a, fg3_pct, 0.5)
+        agg_df['FG3_PCT'] = fg3_pct
+        agg_df['AVG_2_DEF_DIST'] = agg_df['TOT_DIST_2'].to_numpy() / fg2a
+        agg_df['AVG_3_DEF_DIST'] = agg_df['TOT_DIST_3'].to_numpy() / fg3a
+        agg_df['FG2_PCT'] = fg2m / fg2a
+        agg_df['FG_Split'] = fg3a / fg2a
+    agg_df['FGA'] = fg2a + fg3a
+    return agg_df
+
+
+LINEUP_COLUMNS = ['total_possessions', 'total_2pta', 'total_2ptm', 'total_3pta', 'total_3ptm']
+MIN_POSSESSIONS = 1000
+
+
+def split_lineups(lineups, sep=', '):
+    # Explodes an array of unique lineup strings into (lineup index, player) pairs
+    players = pd.Series(lineups).str.split(sep).explode()
+    players = players[players.notna()]
+    return players.index.to_numpy(), players.to_numpy()
+
+
+def aggregate_lineup_exposure(df, min_possessions=MIN_POSSESSIONS):
+    # Same result as process_play_by_play: per defender, the opponent possessions they were on the
+    # floor for and the 2pt/3pt attempts and makes against their lineup.
+    #
+    # Each possession row is paired with its defending lineup (lineup_home on away possessions,
+    # lineup_away on home possessions). Rows are first summed per distinct lineup, then the few
+    # thousand distinct lineups are split into players and summed per player, so no lineup string
+    # is split more than once and each stage is a single bincount per column.
+    away = (df['poss_away'] == 1).to_numpy()
+    home = (df['poss_home'] == 1).to_numpy()
+    lineups = np.concatenate([df['lineup_home'].to_numpy(object)[away], df['lineup_away'].to_numpy(object)[home]])
+    desc_value = np.concatenate([df['desc_value'].to_numpy(float)[away], df['desc_value'].to_numpy(float)[home]])
+    shot_pts = np.concatenate([df['shot_pts'].to_numpy(float)[away], df['shot_pts'].to_numpy(float)[home]])
+    # process_play_by_play counts non-null values of the defending side's possession flag
+    possessions = np.concatenate([df['poss_home'].notna().to_numpy()[away], df['poss_away'].notna().to_numpy()[home]])
+    metrics = [possessions, desc_value == 2, shot_pts == 2, desc_value == 3, shot_pts == 3]
+
+    lineup_codes, unique_lineups = pd.factorize(lineups)
+    on_floor = lineup_codes >= 0
+    lineup_codes = lineup_codes[on_floor]
+    lineup_totals = np.column_stack([np.bincount(lineup_codes, weights=metric[on_floor], minlength=len(unique_lineups))
+                                     for metric in metrics])
+
+    lineup_index, players = split_lineups(unique_lineups)
+    player_codes, player_names = pd.factorize(players, sort=True)
+    player_totals = np.column_stack([np.bincount(player_codes, weights=lineup_totals[lineup_index, i], minlength=len(player_names))
+                                     for i in range(len(metrics))])
+
+    final_agg_df = pd.DataFrame(player_totals.astype(np.int64), columns=LINEUP_COLUMNS)
+    final_agg_df.insert(0, 'player_name', player_names)
+    return final_agg_df[final_agg_df['total_possessions'] >= min_possessions].reset_index(drop=True)
+
+
+def aggregate_lineup_exposure_by_id(df, min_possessions=MIN_POSSESSIONS):
+    # aggregate_lineup_exposure for play-by-play encoded by lineup_encoding.py: keyed by PLAYER_ID,
+    # working on the int32 lineup columns directly (no strings involved)
+    from lineup_encoding import AWAY_ID_COLUMNS, HOME_ID_COLUMNS
+    away = (df['poss_away'] == 1).to_numpy()
+    home = (df['poss_home'] == 1).to_numpy()
+    defenders = np.concatenate([df[HOME_ID_COLUMNS].to_numpy(np.int32)[away], df[AWAY_ID_COLUMNS].to_numpy(np.int32)[home]])
+    desc_value = np.concatenate([df['desc_value'].to_numpy(float)[away], df['desc_value'].to_numpy(float)[home]])
+    shot_pts = np.concatenate([df['shot_pts'].to_numpy(float)[away], df['shot_pts'].to_numpy(float)[home]])
+    possessions = np.concatenate([df['poss_home'].notna().to_numpy()[away], df['poss_away'].notna().to_numpy()[home]])
+    metrics = [possessions, desc_value == 2, shot_pts == 2, desc_value == 3, shot_pts == 3]
+
+    # one (player, possession) row per defender on the floor; slot value 0 is an empty slot
+    players = defenders.ravel()
+    on_floor = players != 0
+    player_codes, player_ids = pd.factorize(players[on_floor], sort=True)
+    totals = np.column_stack([np.bincount(player_codes, weights=np.repeat(metric, 5)[on_floor], minlength=len(player_ids))
+                              for metric in metrics])
+
+    final_agg_df = pd.DataFrame(totals.astype(np.int64), columns=LINEUP_COLUMNS)
+    final_agg_df.insert(0, 'PLAYER_ID', player_ids.astype(np.int32))
+    return final_agg_df[final_agg_df['total_possessions'] >= min_possessions].reset_index(drop=True)
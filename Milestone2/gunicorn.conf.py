@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# Production serving for Dashboard.py:
+#   gunicorn -c gunicorn.conf.py Dashboard:server
+# preload_app imports Dashboard.py once in the master before forking: the clusters table (Arrow)
+# and the feature matrix (.npy) are memory-mapped, so the workers share the same page-cache pages
+# and adding workers adds throughput without multiplying the data in memory.
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('DASHBOARD_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('DASHBOARD_THREADS', 2))
+preload_app = True
+timeout = 60
+
+
+def post_worker_init(worker):
+    # Every worker (including ones gunicorn restarts) re-checks the player lookup every hour; the
+    # lock in player_lookup.refresh_if_stale lets only one of them rebuild it, and the others pick
+    # up the rewritten file by its mtime on their next bar graph callback
+    import Dashboard
+    Dashboard.refresh_positions()
@@ -0,0 +1,125 @@
+import os
+import re
+import unicodedata
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Ingestion stage that turns the comma-joined lineup_home / lineup_away name strings into five
+# int32 PLAYER_ID columns per side, so downstream groupbys and merges use integer keys instead of
+# names. The name <-> ID dictionary is stored next to the data (player_dictionary.parquet).
+HOME_ID_COLUMNS = [f'home_player_id_{i}' for i in range(1, 6)]
+AWAY_ID_COLUMNS = [f'away_player_id_{i}' for i in range(1, 6)]
+DICTIONARY_FILE = 'player_dictionary.parquet'
+
+
+def normalise_name(name):
+    # 'Nikola Jokić' / 'nikola jokic' / 'Nikola  Jokic ' -> 'nikola jokic'
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    return re.sub(r'\s+', ' ', re.sub(r"[.'`]", '', name)).strip().lower()
+
+
+def dictionary_path(data_path):
+    return os.path.join(os.path.dirname(data_path) or '.', DICTIONARY_FILE)
+
+
+def load_dictionary(path):
+    if not os.path.exists(path):
+        return pd.DataFrame({'player_name': pd.Series(dtype=object), 'PLAYER_ID': pd.Series(dtype=np.int32)})
+    return pd.read_parquet(path)
+
+
+def save_dictionary(dictionary, path):
+    tmp_path = f"{path}.tmp"
+    dictionary.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def update_dictionary(dictionary, names, ids):
+    # Adds (name, id) pairs not yet in the dictionary; existing entries win
+    new = pd.DataFrame({'player_name': names, 'PLAYER_ID': ids}).dropna()
+    new = new[~new['player_name'].isin(dictionary['player_name'])].drop_duplicates('player_name')
+    dictionary = pd.concat([dictionary, new.astype({'PLAYER_ID': np.int32})], ignore_index=True)
+    return dictionary.astype({'PLAYER_ID': np.int32})
+
+
+def names_from_player_info(player_info_df):
+    # playerindex / player_info files: PERSON_ID + DISPLAY_FIRST_LAST
+    return player_info_df['DISPLAY_FIRST_LAST'], player_info_df['PERSON_ID']
+
+
+def names_from_play_by_play(pbp_df):
+    # playbyplayv2 rows carry player{n}_name next to player{n}_id
+    names, ids = [], []
+    for n in (1, 2, 3):
+        if f'player{n}_name' in pbp_df.columns and f'player{n}_id' in pbp_df.columns:
+            names.append(pbp_df[f'player{n}_name'])
+            ids.append(pbp_df[f'player{n}_id'])
+    if not names:
+        return pd.Series(dtype=object), pd.Series(dtype=np.int32)
+    names, ids = pd.concat(names, ignore_index=True), pd.concat(ids, ignore_index=True)
+    known = names.notna() & ids.notna() & (ids != 0)
+    return names[known], ids[known]
+
+
+def encode_lineups(pbp_df, dictionary, sep=', '):
+    # Adds HOME_ID_COLUMNS / AWAY_ID_COLUMNS to pbp_df and returns (pbp_df, dictionary). IDs are sorted
+    # within each lineup and empty slots are 0. Names missing from the dictionary are given negative
+    # IDs, so they still aggregate but can never match a real PLAYER_ID, and reported in one warning.
+    lookup = dict(zip(dictionary['player_name'].map(normalise_name), dictionary['PLAYER_ID']))
+    unknown = {}
+    lowest_id = min(0, int(dictionary['PLAYER_ID'].min())) if len(dictionary) else 0
+    # each distinct name is normalised once, however many lineups it appears in
+    keys = {}
+    for lineup_column, id_columns in [('lineup_home', HOME_ID_COLUMNS), ('lineup_away', AWAY_ID_COLUMNS)]:
+        # only distinct lineups are split and looked up
+        codes, lineups = pd.factorize(pbp_df[lineup_column])
+        ids = np.zeros((len(lineups) + 1, 5), dtype=np.int32)
+        for i, lineup in enumerate(lineups):
+            players = lineup.split(sep)
+            if len(players) > 5:
+                raise ValueError(f"Lineup with more than five players: {lineup!r}")
+            for j, player in enumerate(players):
+                key = keys.get(player)
+                if key is None:
+                    key = keys[player] = normalise_name(player)
+                if key not in lookup:
+                    lookup[key] = unknown[player] = lowest_id - len(unknown) - 1
+                ids[i, j] = lookup[key]
+        ids[:-1] = np.sort(np.where(ids[:-1] == 0, np.iinfo(np.int32).max, ids[:-1]), axis=1)
+        ids[ids == np.iinfo(np.int32).max] = 0
+        # code -1 (missing lineup) picks the all-zero last row
+        encoded = ids[codes]
+        for j, column in enumerate(id_columns):
+            pbp_df[column] = encoded[:, j]
+    if unknown:
+        examples = ', '.join(repr(player) for player in list(unknown)[:5])
+        warnings.warn(f"No PLAYER_ID for {len(unknown)} names (e.g. {examples}), using negative IDs", stacklevel=2)
+        dictionary = update_dictionary(dictionary, list(unknown), list(unknown.values()))
+    return pbp_df, dictionary
+
+
+def has_lineup_ids(df):
+    return all(column in df.columns for column in HOME_ID_COLUMNS + AWAY_ID_COLUMNS)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input_file', help="play-by-play parquet with lineup_home / lineup_away")
+    parser.add_argument('output_file')
+    parser.add_argument('--player-info', nargs='*', default=[], help="player_info parquet files (PERSON_ID, DISPLAY_FIRST_LAST)")
+    args = parser.parse_args()
+
+    path = dictionary_path(args.output_file)
+    dictionary = load_dictionary(path)
+    pbp_df = pd.read_parquet(args.input_file)
+    dictionary = update_dictionary(dictionary, *names_from_play_by_play(pbp_df))
+    for player_info_file in args.player_info:
+        player_info_df = pd.read_parquet(player_info_file, columns=['PERSON_ID', 'DISPLAY_FIRST_LAST'])
+        dictionary = update_dictionary(dictionary, *names_from_player_info(player_info_df))
+    pbp_df, dictionary = encode_lineups(pbp_df, dictionary)
+    pbp_df.to_parquet(args.output_file, index=False)
+    save_dictionary(dictionary, path)
+    print(f"Saved {args.output_file} and {len(dictionary)} names to {path}")
@@ -0,0 +1,199 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from data_access import read_stage, read_table
+from lineup_encoding import (AWAY_ID_COLUMNS, HOME_ID_COLUMNS, dictionary_path, encode_lineups, has_lineup_ids,
+                             load_dictionary, save_dictionary)
+from pbp_manifest import normalise_game_id
+
+# Lineup net ratings from the play-by-play files. Every event row credits the home lineup with
+# shot_pts_home / poss_home for and shot_pts_away / poss_away against (and the away lineup the
+# other way round). Lineups are keyed by their five PLAYER_IDs in sorted order (lineup_encoding.py),
+# so the same five players always form one key. Totals per (SEASON, team, lineup) are kept in
+# data/lineup_ratings.parquet together with the game_ids already counted; adding a day's games
+# only reads those games and adds their totals onto the lineups they touch.
+LINEUP_TABLE_PATH = 'data/lineup_ratings.parquet'
+LINEUP_ID_COLUMNS = [f'player_id_{i}' for i in range(1, 6)]
+LINEUP_KEY = ['SEASON', 'team'] + LINEUP_ID_COLUMNS
+TOTAL_COLUMNS = ['points_for', 'points_against', 'poss_for', 'poss_against']
+RANK_COLUMNS = ('net_rating', 'off_rating', 'def_rating', 'net_points', 'possessions', 'points_for')
+TOP_K = 10
+MIN_POSSESSIONS = 100
+
+
+def season_from_game_id(game_ids):
+    # 22400001 / '0022400001' -> '2024-25' (the two digits after the season type)
+    years = (pd.to_numeric(pd.Series(game_ids)).to_numpy(np.int64) // 100000) % 100
+    unique_years, codes = np.unique(years, return_inverse=True)
+    return np.array([f"20{year:02d}-{(year + 1) % 100:02d}" for year in unique_years], dtype=object)[codes.ravel()]
+
+
+def lineup_id_arrays(df, dictionary):
+    # (home ids, away ids) as (n, 5) int32 arrays, encoding the name strings when the file has no
+    # ID columns yet; returns the dictionary too, which grows when unknown names get negative IDs
+    if not has_lineup_ids(df):
+        df, dictionary = encode_lineups(df[['lineup_home', 'lineup_away']].copy(), dictionary)
+    return df[HOME_ID_COLUMNS].to_numpy(np.int32), df[AWAY_ID_COLUMNS].to_numpy(np.int32), dictionary
+
+
+def aggregate_lineups(df, home_ids, away_ids):
+    # Totals per (SEASON, team, lineup) for play-by-play rows, one groupby over the home and
+    # away sides stacked; rows without a known lineup (all-zero IDs) are dropped
+    seasons = season_from_game_id(df['game_id'])
+
+    def values(column):
+        return np.nan_to_num(df[column].to_numpy(np.float64))
+
+    sides = []
+    for team, ids, (pf, pa_, poss_for, poss_against) in [
+            ('team_home', home_ids, ('shot_pts_home', 'shot_pts_away', 'poss_home', 'poss_away')),
+            ('team_away', away_ids, ('shot_pts_away', 'shot_pts_home', 'poss_away', 'poss_home'))]:
+        side = pd.DataFrame(ids, columns=LINEUP_ID_COLUMNS)
+        side.insert(0, 'SEASON', seasons)
+        side.insert(1, 'team', df[team].to_numpy(object))
+        for column, source in zip(TOTAL_COLUMNS, (pf, pa_, poss_for, poss_against)):
+            side[column] = values(source)
+        sides.append(side[ids.any(axis=1)])
+    totals = pd.concat(sides, ignore_index=True).groupby(LINEUP_KEY, sort=False)[TOTAL_COLUMNS].sum()
+    return totals.astype(np.int64).reset_index()
+
+
+def empty_table():
+    table = pd.DataFrame({column: pd.Series(dtype=object) for column in ['SEASON', 'team']})
+    for column in LINEUP_ID_COLUMNS:
+        table[column] = pd.Series(dtype=np.int32)
+    for column in TOTAL_COLUMNS:
+        table[column] = pd.Series(dtype=np.int64)
+    return table
+
+
+def combine_tables(table, new):
+    # Adds new totals onto the lineups they share with table and appends the lineups it lacks
+    if table.empty:
+        return new
+    return pd.concat([table, new], ignore_index=True).groupby(LINEUP_KEY, sort=False)[TOTAL_COLUMNS].sum().reset_index()
+
+
+def load_lineup_table(path=LINEUP_TABLE_PATH):
+    # (table, set of counted game_ids); the game_ids live in the Parquet metadata, so the totals
+    # and the record of what they include are replaced together
+    if not os.path.exists(path):
+        return empty_table(), set()
+    table = pq.read_table(path)
+    games = json.loads((table.schema.metadata or {}).get(b'game_ids', b'[]'))
+    return table.to_pandas(), set(games)
+
+
+def save_lineup_table(table, games, path=LINEUP_TABLE_PATH):
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    metadata = {**(arrow_table.schema.metadata or {}), b'game_ids': json.dumps(sorted(games)).encode()}
+    tmp_path = f"{path}.tmp"
+    pq.write_table(arrow_table.replace_schema_metadata(metadata), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def file_game_ids(path):
+    # Normalised game_ids in a play-by-play file (or directory), reading only that column
+    game_ids = pc.unique(read_table(path, ['game_id'])['game_id'].drop_null()).to_pylist()
+    return {normalise_game_id(game_id) for game_id in game_ids}
+
+
+def update_lineup_table(pbp_paths, output=LINEUP_TABLE_PATH):
+    # Adds the games in pbp_paths that are not in output yet, one file at a time so only one
+    # file's new rows are in memory; returns the updated table
+    table, games = load_lineup_table(output)
+    added = 0
+    for path in pbp_paths:
+        new_games = file_game_ids(path) - games
+        if not new_games:
+            print(f"{path}: no new games")
+            continue
+        df = read_stage('lineup_ratings', path, game_ids=sorted(new_games))
+        dict_path = dictionary_path(path)
+        dictionary = load_dictionary(dict_path)
+        home_ids, away_ids, updated = lineup_id_arrays(df, dictionary)
+        if len(updated) > len(dictionary):
+            # names without a PLAYER_ID keep the same negative ID on the next run
+            save_dictionary(updated, dict_path)
+        new = aggregate_lineups(df, home_ids, away_ids)
+        print(f"{path}: {len(new_games)} new games touching {len(new)} lineups")
+        table = combine_tables(table, new)
+        games |= new_games
+        added += len(new_games)
+    if added or not os.path.exists(output):
+        save_lineup_table(table, games, output)
+        print(f"Saved {len(table)} lineups from {len(games)} games to {output}")
+    return table
+
+
+def lineup_names(table, dictionary):
+    # 'Name, Name, ...' for each row's lineup IDs (IDs missing from the dictionary stay numbers)
+    names = dict(zip(dictionary['PLAYER_ID'].to_numpy(np.int64), dictionary['player_name']))
+    return [', '.join(str(names.get(player_id, player_id)) for player_id in row if player_id != 0)
+            for row in table[LINEUP_ID_COLUMNS].to_numpy(np.int64).tolist()]
+
+
+def per_possession(points, possessions):
+    # points / possessions, NaN where there were no possessions
+    points = points.to_numpy(np.float64)
+    possessions = possessions.to_numpy(np.float64)
+    return np.divide(points, possessions, out=np.full(len(points), np.nan), where=possessions > 0)
+
+
+def top_lineups(table, k=TOP_K, by='net_rating', min_possessions=MIN_POSSESSIONS, seasons=None, per_season=True,
+                dictionary=None):
+    # The k best lineups of every team (per season, or over the selected seasons combined) by one
+    # of RANK_COLUMNS; ratings are points per 100 possessions. A stable sort followed by
+    # groupby().head(k) replaces the per-team nlargest in an apply.
+    if by not in RANK_COLUMNS:
+        raise ValueError(f"by must be one of {RANK_COLUMNS}, got {by!r}")
+    if seasons is not None:
+        table = table[table['SEASON'].isin(seasons)]
+    group = ['SEASON', 'team'] if per_season else ['team']
+    if not per_season:
+        table = table.groupby(group + LINEUP_ID_COLUMNS, sort=False)[TOTAL_COLUMNS].sum().reset_index()
+
+    ranked = table.copy()
+    ranked['possessions'] = ranked['poss_for'] + ranked['poss_against']
+    # a lineup without possessions on both ends has no rating, so it is never ranked
+    ranked = ranked[(ranked['possessions'] >= min_possessions) & (ranked['poss_for'] > 0)
+                    & (ranked['poss_against'] > 0)]
+    ranked['off_rating'] = 100 * per_possession(ranked['points_for'], ranked['poss_for'])
+    ranked['def_rating'] = 100 * per_possession(ranked['points_against'], ranked['poss_against'])
+    ranked['net_rating'] = ranked['off_rating'] - ranked['def_rating']
+    ranked['net_points'] = ranked['points_for'] - ranked['points_against']
+    ranked = ranked.sort_values(group + [by], ascending=[True] * len(group) + [by == 'def_rating'], kind='stable')
+    ranked = ranked.groupby(group, sort=False).head(k).reset_index(drop=True)
+    if dictionary is not None:
+        ranked.insert(len(group), 'lineup', lineup_names(ranked, dictionary))
+    return ranked
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pbp_files', nargs='*', help="play-by-play parquet files or pbp_stream directories to add")
+    parser.add_argument('--table', default=LINEUP_TABLE_PATH)
+    parser.add_argument('--top', type=int, default=TOP_K)
+    parser.add_argument('--by', choices=RANK_COLUMNS, default='net_rating')
+    parser.add_argument('--min-possessions', type=int, default=MIN_POSSESSIONS)
+    parser.add_argument('--seasons', nargs='*', default=None)
+    parser.add_argument('--combine-seasons', action='store_true', help="rank over the selected seasons together")
+    parser.add_argument('--output', default=None, help="write the ranking to this parquet file")
+    args = parser.parse_args()
+
+    table = update_lineup_table(args.pbp_files, args.table) if args.pbp_files else load_lineup_table(args.table)[0]
+    dictionary = load_dictionary(dictionary_path(args.pbp_files[0] if args.pbp_files else args.table))
+    ranked = top_lineups(table, args.top, args.by, args.min_possessions, args.seasons, not args.combine_seasons,
+                         dictionary)
+    if args.output:
+        ranked.to_parquet(args.output, index=False)
+        print(f"Saved {len(ranked)} lineups to {args.output}")
+    else:
+        print(ranked.to_string(index=False))
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_access import read_stage
+from formatting_engine import (aggregate_defender_dashboard, aggregate_lineup_exposure, aggregate_lineup_exposure_by_id,
+                               read_defender_dashboards)
+from lineup_encoding import has_lineup_ids
+
+# Builds <yy_yy>merged_player_stats.parquet for any list of seasons (what Data Formatting.py used to
+# do for one hard-coded season), one season per worker process, plus a combined multi-season file.
+SEASONS = ['2021-22', '2022-23', '2023-24', '2024-25']
+ANTHRO_FILE = '00_24_anthro.parquet'
+
+
+def season_prefix(season):
+    # '2023-24' -> '23_24'
+    return f"{season[2:4]}_{season[5:7]}"
+
+
+def season_paths(season, data_dir='data'):
+    prefix = season_prefix(season)
+    return {
+        'defender_dashboard': os.path.join(data_dir, f'{prefix}defender_dashboard.parquet'),
+        'play_by_play': os.path.join(data_dir, f'{prefix}_combined_pbp.parquet'),
+        'per100poss': os.path.join(data_dir, f'{season}player_per100poss.parquet'),
+        'player_info': os.path.join(data_dir, f'{season}player_info.parquet'),
+        'anthro': os.path.join(data_dir, ANTHRO_FILE),
+        'output': os.path.join(data_dir, f'{prefix}merged_player_stats.parquet'),
+    }
+
+
+def combined_path(seasons, data_dir='data'):
+    # ['2021-22', ..., '2024-25'] -> data/21-25merged_player_stats.parquet
+    seasons = sorted(seasons)
+    return os.path.join(data_dir, f"{seasons[0][2:4]}-{seasons[-1][5:7]}merged_player_stats.parquet")
+
+
+def merge_season(season, paths):
+    agg_df = aggregate_defender_dashboard(read_defender_dashboards(paths['defender_dashboard'])).drop(columns='SEASON')
+
+    pbp_df = read_stage('lineup_exposure', paths['play_by_play'])
+    # play-by-play encoded by lineup_encoding.py is aggregated and merged on PLAYER_ID,
+    # older files fall back to matching lineup names against DISPLAY_FIRST_LAST
+    by_id = has_lineup_ids(pbp_df)
+    final_agg_df = aggregate_lineup_exposure_by_id(pbp_df) if by_id else aggregate_lineup_exposure(pbp_df)
+    del pbp_df
+
+    filtered_df = read_stage('per100poss', paths['per100poss'])
+    filtered_player_anthro_df = read_stage('anthro', paths['anthro']).astype({'PLAYER_ID': int})
+    filtered_player_info_df = read_stage('player_info', paths['player_info']).astype({'PERSON_ID': int})
+
+    agg_df['PLAYER_ID'] = agg_df['PLAYER_ID'].astype(int)
+    merged_df = agg_df.merge(filtered_player_info_df, left_on='PLAYER_ID', right_on='PERSON_ID', how='left')
+    merged_df = merged_df.merge(filtered_player_anthro_df, on='PLAYER_ID', how='left')
+    if by_id:
+        merged_df = merged_df.merge(final_agg_df, on='PLAYER_ID', how='left')
+        merged_df['player_name'] = merged_df['DISPLAY_FIRST_LAST']
+    else:
+        merged_df = merged_df.merge(final_agg_df, left_on='DISPLAY_FIRST_LAST', right_on='player_name', how='left')
+    merged_df = merged_df.merge(filtered_df, on='PLAYER_ID', how='left')
+    merged_df['SEASON'] = season
+
+    merged_df['FG2Target'] = merged_df['FG2A']/merged_df['total_2pta']
+    merged_df['FG3Target'] = merged_df['FG3A']/merged_df['total_3pta']
+    merged_df['FGTarget'] = merged_df['FGA']/merged_df['total_possessions']
+    merged_df['2FG%diff'] = merged_df['FG2_PCT'] - (merged_df['total_2ptm']/merged_df['total_2pta'])
+    merged_df['3FG%diff'] = merged_df['FG3_PCT'] - (merged_df['total_3ptm']/merged_df['total_3pta'])
+    merged_df['Poss/Game'] = merged_df['total_possessions']/merged_df['GP']
+
+    merged_df = merged_df.drop(columns=['FG2M', 'FG2A', 'FG3M', 'FG3A', 'total_possessions', 'GP', 'FGA', 'TOT_DIST_2', 'TOT_DIST_3',
+                                        'total_2pta', 'total_2ptm', 'total_3ptm', 'total_3pta', 'DISPLAY_FIRST_LAST', 'PERSON_ID',
+                                        'DISPLAY_LAST_COMMA_FIRST'])
+    merged_df = merged_df.dropna()
+
+    # Reorder columns
+    cols = ['player_name', 'SEASON', 'PLAYER_ID'] + [col for col in merged_df.columns if col not in ['player_name', 'SEASON', 'PLAYER_ID']]
+    return merged_df[cols]
+
+
+def build_season(season, data_dir='data'):
+    paths = season_paths(season, data_dir)
+    merged_df = merge_season(season, paths)
+    merged_df.to_parquet(paths['output'], index=False)
+    print(f"Saved {len(merged_df)} players for {season} to {paths['output']}")
+    return paths['output']
+
+
+def build_seasons(seasons=SEASONS, data_dir='data', workers=None):
+    # One season per worker; returns the per-season outputs and the combined file
+    workers = workers or min(len(seasons), os.cpu_count() or 1)
+    if workers == 1:
+        outputs = [build_season(season, data_dir) for season in seasons]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(build_season, seasons, [data_dir] * len(seasons)))
+    combined = combined_path(seasons, data_dir)
+    combine_seasons(outputs, combined)
+    return outputs, combined
+
+
+def combine_seasons(outputs, combined):
+    pd.concat([pd.read_parquet(output) for output in outputs], ignore_index=True).to_parquet(combined, index=False)
+    print(f"Saved combined player stats to {combined}")
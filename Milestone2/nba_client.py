@@ -0,0 +1,229 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import date
+
+import aiohttp
+import pandas as pd
+
+# NBA_STATS_BASE_URL points every fetcher at another server, e.g. nba_stub_server.py
+BASE_URL = os.environ.get('NBA_STATS_BASE_URL', 'https://stats.nba.com/stats')
+
+headers = {'Connection': 'keep-alive',
+        'Host': 'stats.nba.com',
+        'Origin': 'http://stats.nba.com',
+        'Upgrade-Insecure-Requests': '1',
+        'Referer': 'https://stats.nba.com',
+        'x-nba-stats-origin': 'stats',
+        'x-nba-stats-token': 'true',
+        'Accept-Language': 'en-US,en;q=0.5',
+        "Accept": "application/json, text/plain, */*",
+        "X-NewRelic-ID": "VQECWF5UChAHUlNTBwgBVw==",
+        'User-Agent': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) " + \
+                        "AppleWebKit/537.36 (KHTML, like Gecko) " + \
+                        "Chrome/84.0.4147.89 Safari/537.36"}
+
+# Responses are cached on disk keyed by endpoint and parameters. Set NBA_STATS_OFFLINE=1 to
+# serve only from the cache (misses come back as errors instead of touching the network).
+CACHE_DIR = os.environ.get('NBA_STATS_CACHE', 'data/http_cache')
+OFFLINE = os.environ.get('NBA_STATS_OFFLINE', '') not in ('', '0')
+
+# Seconds a cached response stays fresh; None never expires. Any endpoint asked about a season
+# that has already finished is also kept forever, see cache_ttl.
+DEFAULT_TTL = 24 * 60 * 60
+ENDPOINT_TTLS = {
+    'playbyplayv2': None,
+    'draftcombineplayeranthro': 7 * 24 * 60 * 60,
+    'commonplayerinfo': 7 * 24 * 60 * 60,
+    'playerindex': 24 * 60 * 60,
+    'leaguedashplayerstats': 12 * 60 * 60,
+}
+
+# stats.nba.com answers 429 when throttling and 5xx when overloaded, both are worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    # Hands out `rate` tokens per second on average, with bursts of up to `capacity`
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def season_finished(params, today=None):
+    # Season='2021-22' or SeasonYear=2021; a season is final once its playoffs are over (July)
+    season = params.get('Season') or params.get('SeasonYear')
+    if not season:
+        return False
+    today = today or date.today()
+    end_year = int(str(season)[:4]) + 1
+    return (today.year, today.month) >= (end_year, 7)
+
+
+def cache_ttl(endpoint, params, ttls=None):
+    ttls = ENDPOINT_TTLS if ttls is None else ttls
+    ttl = ttls.get(endpoint, DEFAULT_TTL)
+    if ttl is None or season_finished(params or {}):
+        return None
+    return ttl
+
+
+class ResponseCache:
+    # Content-addressed store of decoded JSON payloads: <cache_dir>/<key[:2]>/<key>.json.gz
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def key(self, endpoint, params):
+        params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        return hashlib.sha256(json.dumps([endpoint, params]).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def load(self, endpoint, params, ttl=None):
+        # Returns the cached payload, or None if missing or older than ttl seconds
+        path = self.path(self.key(endpoint, params))
+        try:
+            with gzip.open(path, 'rt') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            return None
+        if ttl is not None and time.time() - entry['fetched_at'] > ttl:
+            return None
+        return entry['data']
+
+    def store(self, endpoint, params, data):
+        path = self.path(self.key(endpoint, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wt') as f:
+            json.dump({'endpoint': endpoint, 'params': params, 'fetched_at': time.time(), 'data': data}, f)
+        os.replace(tmp_path, path)
+
+
+def result_set_frame(data, index=0):
+    result = data['resultSets'][index]
+    return pd.DataFrame(result['rowSet'], columns=result['headers'])
+
+
+def result_set_records(data, index=0):
+    # Rows as plain dicts, for callers that collect many responses and build one frame at the end
+    result = data['resultSets'][index]
+    return [dict(zip(result['headers'], row)) for row in result['rowSet']]
+
+
+class StatsClient:
+    # One aiohttp connection pool shared by every request, with bounded concurrency,
+    # a token-bucket rate limit and exponential backoff on 429/5xx responses. Payloads go
+    # through a ResponseCache (cache_dir=None disables it); offline=True only reads the cache.
+    #
+    #   async with StatsClient(max_concurrency=8, requests_per_second=4) as client:
+    #       data = await client.get('playbyplayv2', {'GameID': '0022400001'})
+    def __init__(self, base_url=BASE_URL, max_concurrency=8, requests_per_second=4.0,
+                 burst=None, retries=5, backoff=1.0, timeout=60, cache_dir=CACHE_DIR,
+                 offline=None, ttls=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.offline = OFFLINE if offline is None else offline
+        self.ttls = ttls
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self.session = aiohttp.ClientSession(connector=connector, headers=headers,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.limiter = TokenBucket(self.requests_per_second, self.burst) if self.requests_per_second else None
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+
+    def retry_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+    async def get(self, endpoint, params=None):
+        # Returns the decoded JSON payload, or None once the retries are used up
+        if self.cache is not None:
+            ttl = None if self.offline else cache_ttl(endpoint, params, self.ttls)
+            data = self.cache.load(endpoint, params, ttl)
+            if data is not None:
+                return data
+        if self.offline:
+            print(f"Offline: no cached {endpoint} response for {params}")
+            return None
+        data = await self.fetch(endpoint, params)
+        if data is not None and self.cache is not None:
+            self.cache.store(endpoint, params, data)
+        return data
+
+    async def fetch(self, endpoint, params=None):
+        url = f"{self.base_url}/{endpoint}"
+        status = None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            try:
+                async with self.semaphore:
+                    async with self.session.get(url, params=params) as response:
+                        status = response.status
+                        if status == 200:
+                            return await response.json(content_type=None)
+                        retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = repr(e)
+            else:
+                if status not in RETRY_STATUSES:
+                    break
+            if attempt < self.retries:
+                await asyncio.sleep(self.retry_delay(attempt, retry_after))
+        print(f"Error fetching {endpoint} {params} from {url}: {status}")
+        return None
+
+    async def get_frame(self, endpoint, params=None, index=0):
+        data = await self.get(endpoint, params)
+        if data is None:
+            return pd.DataFrame()
+        return result_set_frame(data, index)
+
+
+def run(main, **client_kwargs):
+    # Runs `await main(client)` inside a StatsClient and returns its result, e.g.
+    #   async def main(client):
+    #       return await client.get_frame('playerindex', {'LeagueID': '00', 'Season': '2024-25'})
+    #   df = run(main)
+    async def runner():
+        async with StatsClient(**client_kwargs) as client:
+            return await main(client)
+    return asyncio.run(runner())
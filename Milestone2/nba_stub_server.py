@@ -0,0 +1,255 @@
+import asyncio
+import json
+import random
+import threading
+from functools import lru_cache
+
+from aiohttp import web
+
+from nba_client import ResponseCache
+
+# Local stand-in for stats.nba.com, for load-testing the fetchers without the network:
+#   python nba_stub_server.py --port 8765 --latency 0.05 --rate-429 0.05
+#   python pbp_data_initial.py ... (with StatsClient(base_url='http://127.0.0.1:8765/stats'))
+# It answers playbyplayv2, playerindex, draftcombineplayeranthro, commonplayerinfo and
+# leaguedashplayerstats with synthetic resultSets payloads (deterministic per request), or replays
+# responses recorded in an nba_client ResponseCache directory. Latency, 429s (with Retry-After)
+# and 500s can be injected; GET /_stats returns the request counts and the most requests that were
+# in flight at once.
+STATS = web.AppKey('stats', dict)
+ENDPOINTS = ('playbyplayv2', 'playerindex', 'draftcombineplayeranthro', 'commonplayerinfo', 'leaguedashplayerstats')
+EVENTS_PER_GAME = 450
+PLAYERS_PER_SEASON = 550
+POSITIONS = ['G', 'F', 'C', 'G-F', 'F-G', 'F-C', 'C-F']
+
+
+def result_sets(name, headers, rows):
+    return {'resource': name, 'parameters': {}, 'resultSets': [{'name': name, 'headers': headers, 'rowSet': rows}]}
+
+
+def player_id(i):
+    return 1_600_000 + i
+
+
+def player_name(i):
+    return f"Player {i:04d}"
+
+
+@lru_cache(maxsize=4096)
+def play_by_play(game_id):
+    from pbp_data_initial import PBP_SCHEMA
+    rng = random.Random(game_id)
+    headers = [name.upper() for name in PBP_SCHEMA.names]
+    rows = []
+    for event in range(EVENTS_PER_GAME):
+        values = {'GAME_ID': game_id, 'EVENTNUM': event, 'EVENTMSGTYPE': rng.randint(1, 13),
+                  'EVENTMSGACTIONTYPE': rng.randint(0, 110), 'PERIOD': 1 + event * 4 // EVENTS_PER_GAME,
+                  'WCTIMESTRING': '7:10 PM', 'PCTIMESTRING': f"{11 - event % 12}:{rng.randint(0, 59):02d}",
+                  'HOMEDESCRIPTION': 'Jump Shot' if rng.random() < 0.5 else None, 'NEUTRALDESCRIPTION': None,
+                  'VISITORDESCRIPTION': 'Rebound' if rng.random() < 0.5 else None, 'SCORE': None,
+                  'SCOREMARGIN': None, 'VIDEO_AVAILABLE_FLAG': 1}
+        for n in (1, 2, 3):
+            i = rng.randrange(PLAYERS_PER_SEASON)
+            values.update({f'PERSON{n}TYPE': 4, f'PLAYER{n}_ID': player_id(i), f'PLAYER{n}_NAME': player_name(i),
+                           f'PLAYER{n}_TEAM_ID': 1_610_612_737 + i % 30, f'PLAYER{n}_TEAM_CITY': 'City',
+                           f'PLAYER{n}_TEAM_NICKNAME': 'Team', f'PLAYER{n}_TEAM_ABBREVIATION': 'TEA'})
+        rows.append([values.get(header) for header in headers])
+    return json.dumps(result_sets('PlayByPlay', headers, rows))
+
+
+def player_index(season):
+    headers = ['PERSON_ID', 'PLAYER_LAST_NAME', 'PLAYER_FIRST_NAME', 'TEAM_ID', 'POSITION', 'HEIGHT', 'WEIGHT', 'SEASON']
+    rows = [[player_id(i), f"{i:04d}", 'Player', 1_610_612_737 + i % 30, POSITIONS[i % len(POSITIONS)],
+             f"{6 + i % 2}-{i % 12}", str(180 + i % 80), season] for i in range(PLAYERS_PER_SEASON)]
+    return result_sets('PlayerIndex', headers, rows)
+
+
+def draft_combine_anthro(season_year):
+    rng = random.Random(f"anthro-{season_year}")
+    headers = ['TEMP_PLAYER_ID', 'PLAYER_ID', 'FIRST_NAME', 'LAST_NAME', 'PLAYER_NAME', 'POSITION',
+               'HEIGHT_WO_SHOES', 'HEIGHT_WO_SHOES_FT_IN', 'WEIGHT', 'WINGSPAN', 'WINGSPAN_FT_IN', 'STANDING_REACH']
+    offset = (int(str(season_year)[:4]) % 20) * 60
+    rows = []
+    for i in range(offset, offset + 60):
+        height = round(rng.uniform(72, 86), 2)
+        wingspan = round(height * rng.uniform(1.0, 1.1), 2)
+        rows.append([i, player_id(i), 'Player', f"{i:04d}", player_name(i), POSITIONS[i % len(POSITIONS)], height,
+                     None, str(180 + i % 80), wingspan, None, round(height * 1.33, 1)])
+    return result_sets('Results', headers, rows)
+
+
+def common_player_info(person_id):
+    i = int(person_id) - 1_600_000
+    headers = ['PERSON_ID', 'FIRST_NAME', 'LAST_NAME', 'DISPLAY_FIRST_LAST', 'DISPLAY_LAST_COMMA_FIRST', 'HEIGHT',
+               'WEIGHT', 'POSITION']
+    rows = [[int(person_id), 'Player', f"{i:04d}", player_name(i), f"{i:04d}, Player", f"{6 + i % 2}-{i % 12}",
+             str(180 + i % 80), POSITIONS[i % len(POSITIONS)]]]
+    return result_sets('CommonPlayerInfo', headers, rows)
+
+
+def league_dash_player_stats(season):
+    rng = random.Random(f"stats-{season}")
+    headers = ['PLAYER_ID', 'PLAYER_NAME', 'TEAM_ID', 'TEAM_ABBREVIATION', 'AGE', 'GP', 'W', 'L', 'MIN', 'FGM', 'FGA',
+               'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'OREB', 'DREB', 'REB', 'AST', 'TOV', 'STL', 'BLK', 'PF', 'PTS']
+    rows = []
+    for i in range(PLAYERS_PER_SEASON):
+        gp = rng.randint(1, 82)
+        fga, fg3a = round(rng.uniform(5, 30), 1), round(rng.uniform(0, 12), 1)
+        dreb, oreb = round(rng.uniform(3, 15), 1), round(rng.uniform(0, 6), 1)
+        rows.append([player_id(i), player_name(i), 1_610_612_737 + i % 30, 'TEA', rng.randint(19, 40), gp, gp // 2,
+                     gp - gp // 2, round(rng.uniform(5, 48), 1), round(fga * 0.46, 1), fga, 0.46, round(fg3a * 0.36, 1),
+                     fg3a, 0.36, oreb, dreb, round(oreb + dreb, 1), round(rng.uniform(1, 12), 1),
+                     round(rng.uniform(1, 6), 1), round(rng.uniform(0, 3), 1), round(rng.uniform(0, 4), 1),
+                     round(rng.uniform(1, 6), 1), round(rng.uniform(5, 40), 1)])
+    return result_sets('LeagueDashPlayerStats', headers, rows)
+
+
+def synthetic_payload(endpoint, params):
+    # JSON text for one request
+    if endpoint == 'playbyplayv2':
+        return play_by_play(str(params.get('GameID', '')))
+    if endpoint == 'playerindex':
+        return json.dumps(player_index(params.get('Season', '')))
+    if endpoint == 'draftcombineplayeranthro':
+        return json.dumps(draft_combine_anthro(params.get('SeasonYear', '2024')))
+    if endpoint == 'commonplayerinfo':
+        return json.dumps(common_player_info(params.get('PlayerID', 0)))
+    if endpoint == 'leaguedashplayerstats':
+        return json.dumps(league_dash_player_stats(params.get('Season', '')))
+    return None
+
+
+class StubOptions:
+    # latency: base seconds per response, plus up to jitter seconds. rate_429 / error_rate: share of
+    # requests answered 429 (with Retry-After: retry_after) / 500. replay_dir: ResponseCache
+    # directory whose recorded payloads are served before falling back to synthetic ones.
+    def __init__(self, latency=0.0, jitter=0.0, rate_429=0.0, retry_after=0, error_rate=0.0, replay_dir=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.replay = ResponseCache(replay_dir) if replay_dir else None
+        self.random = random.Random(seed)
+
+
+def make_app(options=None):
+    options = options or StubOptions()
+    stats = {'requests': 0, 'by_endpoint': {}, 'by_status': {}, 'in_flight': 0, 'max_in_flight': 0}
+
+    def count(endpoint, status):
+        stats['requests'] += 1
+        stats['by_endpoint'][endpoint] = stats['by_endpoint'].get(endpoint, 0) + 1
+        stats['by_status'][str(status)] = stats['by_status'].get(str(status), 0) + 1
+
+    async def handle(request):
+        stats['in_flight'] += 1
+        stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        try:
+            return await respond(request.match_info['endpoint'], dict(request.query))
+        finally:
+            stats['in_flight'] -= 1
+
+    async def respond(endpoint, params):
+        if options.latency or options.jitter:
+            await asyncio.sleep(options.latency + options.random.uniform(0, options.jitter))
+        roll = options.random.random()
+        if roll < options.rate_429:
+            count(endpoint, 429)
+            return web.Response(status=429, headers={'Retry-After': str(options.retry_after)})
+        if roll < options.rate_429 + options.error_rate:
+            count(endpoint, 500)
+            return web.Response(status=500, text='Internal Server Error')
+        data = options.replay.load(endpoint, params) if options.replay is not None else None
+        body = json.dumps(data) if data is not None else synthetic_payload(endpoint, params)
+        if body is None:
+            count(endpoint, 404)
+            return web.Response(status=404, text=f"Unknown endpoint {endpoint}")
+        count(endpoint, 200)
+        return web.Response(text=body, content_type='application/json')
+
+    async def handle_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app[STATS] = stats
+    app.router.add_get('/_stats', handle_stats)
+    app.router.add_get('/stats/{endpoint}', handle)
+    return app
+
+
+class StubServer:
+    # Runs the stand-in server on its own event loop in a daemon thread, so synchronous callers
+    # (pbp_raw, player_info, ... each call asyncio.run) can use it:
+    #   with StubServer(StubOptions(latency=0.05)) as server:
+    #       pbp_raw(game_ids, base_url=server.base_url, cache_dir=None)
+    #       print(server.stats)
+    def __init__(self, options=None, host='127.0.0.1', port=0):
+        self.app = make_app(options)
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.runner = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/stats"
+
+    @property
+    def stats(self):
+        return self.app[STATS]
+
+    def reset_stats(self):
+        self.stats.update({'requests': 0, 'by_endpoint': {}, 'by_status': {}, 'max_in_flight': 0})
+
+    async def start_site(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # port=0 picks a free port
+        self.port = self.runner.addresses[0][1]
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start_site())
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=serve, name='nba-stub-server', daemon=True)
+        self.thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra seconds, at random")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument('--retry-after', type=int, default=0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument('--replay', default=None, help="ResponseCache directory with recorded responses")
+    args = parser.parse_args()
+    options = StubOptions(args.latency, args.jitter, args.rate_429, args.retry_after, args.error_rate, args.replay)
+    print(f"Serving stats.nba.com stand-in on http://{args.host}:{args.port}/stats")
+    web.run_app(make_app(options), host=args.host, port=args.port)
@@ -1,102 +1,202 @@
-def pbp_raw(game_ids):
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+# Fixed schema for playbyplayv2 rows (column names lower-cased, as written to parquet), so every
+# streamed game lands with identical types even when a game has no values in a column.
+PBP_SCHEMA = pa.schema(
+    [('game_id', pa.string()), ('eventnum', pa.int64()), ('eventmsgtype', pa.int64()),
+     ('eventmsgactiontype', pa.int64()), ('period', pa.int64()), ('wctimestring', pa.string()),
+     ('pctimestring', pa.string()), ('homedescription', pa.string()), ('neutraldescription', pa.string()),
+     ('visitordescription', pa.string()), ('score', pa.string()), ('scoremargin', pa.string())]
+    + [field for n in (1, 2, 3) for field in [
+        (f'person{n}type', pa.int64()), (f'player{n}_id', pa.int64()), (f'player{n}_name', pa.string()),
+        (f'player{n}_team_id', pa.int64()), (f'player{n}_team_city', pa.string()),
+        (f'player{n}_team_nickname', pa.string()), (f'player{n}_team_abbreviation', pa.string())]]
+    + [('video_available_flag', pa.int64())]
+)
+
+
+def pbp_table(df):
+    df = df.rename(columns=str.lower).reindex(columns=PBP_SCHEMA.names)
+    return pa.Table.from_pandas(df, schema=PBP_SCHEMA, preserve_index=False)
+
+
+@contextmanager
+def pbp_appender(output_path):
+    import os
+    import pyarrow.parquet as pq
+
+    # ParquetWriter into a temporary file that starts with the rows already in output_path and
+    # replaces it when the writer closes (also on any error/interrupt, so rows written so far are
+    # kept). Writing to an existing output therefore appends instead of truncating the games the
+    # manifest already records as ingested from it.
+    existing = pq.ParquetFile(output_path) if os.path.exists(output_path) else None
+    if existing is not None and not existing.schema_arrow.equals(PBP_SCHEMA):
+        raise ValueError(f"{output_path} was not written with PBP_SCHEMA; use a new output file or partitioned=True")
+    tmp_path = f"{output_path}.tmp"
+    try:
+        with pq.ParquetWriter(tmp_path, PBP_SCHEMA) as writer:
+            if existing is not None:
+                for batch in existing.iter_batches():
+                    writer.write_batch(batch)
+                existing.close()
+            yield writer
+    finally:
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, output_path)
+
+
+def pbp_raw(game_ids, max_concurrency=8, requests_per_second=4.0, base_url=None, **client_kwargs):
     import asyncio
-    import aiohttp
     import pandas as pd
-    from nba_api.stats.endpoints import leaguegamefinder
-    import os
-    
-
-    # Get all games for the season
-    
-
-    headers = {'Connection': 'keep-alive',
-            'Host': 'stats.nba.com',
-            'Origin': 'http://stats.nba.com',
-            'Upgrade-Insecure-Requests': '1',
-            'Referer': 'https://stats.nba.com',
-            'x-nba-stats-origin': 'stats',
-            'x-nba-stats-token': 'true',
-            'Accept-Language': 'en-US,en;q=0.5',
-            "Accept": "application/json, text/plain, */*",
-            "X-NewRelic-ID": "VQECWF5UChAHUlNTBwgBVw==",
-            'User-Agent': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) " + \
-                            "AppleWebKit/537.36 (KHTML, like Gecko) " + \
-                            "Chrome/84.0.4147.89 Safari/537.36"}
-
-
-    async def fetch_play_by_play(session, game_id):
-        url = f"https://stats.nba.com/stats/playbyplayv2?GameID={game_id}&StartPeriod=0&EndPeriod=14"
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                df =  pd.DataFrame(data['resultSets'][0]['rowSet'], columns=data['resultSets'][0]['headers'])
-                print(f"Processed game {game_id} with {len(df)} rows")
-                return df
-            else:
-                print(f"Error fetching play-by-play data for game {game_id} from {url}: {response.status}")
-                return pd.DataFrame()
+    from nba_client import StatsClient, BASE_URL
+
+    # Games are fetched concurrently (at most max_concurrency in flight) and the token bucket
+    # keeps the overall request rate under requests_per_second, replacing the old fixed
+    # 60 second sleep after every 252 games. 429/5xx responses are retried with backoff.
+    # client_kwargs go to StatsClient, e.g. cache_dir=None when load-testing nba_stub_server.py.
+
+    async def fetch_play_by_play(client, game_id):
+        params = {'GameID': game_id, 'StartPeriod': 0, 'EndPeriod': 14}
+        df = await client.get_frame('playbyplayv2', params)
+        if not df.empty:
+            print(f"Processed game {game_id} with {len(df)} rows")
+        return df
 
     async def main():
-        async with aiohttp.ClientSession() as session:
-            play_by_play_data = []
-            for i, game_id in enumerate(game_ids):
-                play_by_play_data.append(await fetch_play_by_play(session, game_id))
-                #print(len(play_by_play_data))
-                if (i + 1) % 252 == 0:
-                    print(f"Processed {i + 1} games, waiting for 60 seconds...")
-                    await asyncio.sleep(60)
-            
+        async with StatsClient(base_url=base_url or BASE_URL, max_concurrency=max_concurrency,
+                               requests_per_second=requests_per_second, **client_kwargs) as client:
+            # gather keeps the results in game_ids order
+            play_by_play_data = await asyncio.gather(*(fetch_play_by_play(client, game_id) for game_id in game_ids))
+
             # Concatenate all play-by-play data into a single DataFrame
+            if not play_by_play_data:
+                return pd.DataFrame()
             complete_data = pd.concat(play_by_play_data,ignore_index=True)
             print(len(complete_data))
             return complete_data
-            
-            
-            # Save to a parquet file
-            
 
     # Run the main function
     result = asyncio.run(main())
     return result
 
+def pbp_stream(game_ids, output_path, partitioned=False, on_game=None,
+               max_concurrency=8, requests_per_second=4.0, base_url=None, **client_kwargs):
+    import asyncio
+    import os
+    import pyarrow.parquet as pq
+    from nba_client import StatsClient, BASE_URL
+
+    # Same fetching as pbp_raw, but each game is written out as soon as it arrives instead of
+    # being held for one big concat, so memory stays flat over a season.
+    #   partitioned=False: one parquet file written through pbp_appender, so a resumed run
+    #                      appends to output_path and finished games are kept on any error.
+    #   partitioned=True:  output_path is a directory with one <game_id>.parquet per game, each
+    #                      written atomically; games already on disk are skipped on a re-run.
+    # on_game(game_id, n_rows) is called after each game has been written.
+
+    def game_file(game_id):
+        return os.path.join(output_path, f"{game_id}.parquet")
+
+    if partitioned:
+        os.makedirs(output_path, exist_ok=True)
+        game_ids = [game_id for game_id in game_ids if not os.path.exists(game_file(game_id))]
+
+    async def fetch_play_by_play(client, game_id):
+        params = {'GameID': game_id, 'StartPeriod': 0, 'EndPeriod': 14}
+        return game_id, await client.get_frame('playbyplayv2', params)
+
+    def write_partition(game_id, table):
+        tmp_path = game_file(game_id) + '.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, game_file(game_id))
+
+    async def main(writer):
+        written = 0
+        async with StatsClient(base_url=base_url or BASE_URL, max_concurrency=max_concurrency,
+                               requests_per_second=requests_per_second, **client_kwargs) as client:
+            tasks = [fetch_play_by_play(client, game_id) for game_id in game_ids]
+            for next_game in asyncio.as_completed(tasks):
+                game_id, df = await next_game
+                if df.empty:
+                    continue
+                table = pbp_table(df)
+                if writer is None:
+                    write_partition(game_id, table)
+                else:
+                    writer.write_table(table)
+                written += 1
+                print(f"Wrote game {game_id} with {len(df)} rows")
+                if on_game is not None:
+                    on_game(game_id, len(df))
+        return written
+
+    if partitioned:
+        return asyncio.run(main(None))
+    with pbp_appender(output_path) as writer:
+        return asyncio.run(main(writer))
+
+
 if __name__ == '__main__':
     import asyncio
     import aiohttp
     import pandas as pd
     from nba_api.stats.endpoints import leaguegamefinder
     import os
-    import pyarrow.parquet as pq
-    import pyarrow as pa
 
     gamefinder = leaguegamefinder.LeagueGameFinder(season_nullable='2024-25', 
                                                 league_id_nullable='00', 
                                                 season_type_nullable='Regular Season')
     games = gamefinder.get_data_frames()[0]
 
-    existing_game_ids = set()
     import argparse
+    from pbp_manifest import (bootstrap_from_parquet, default_manifest_path, has_source,
+                              ingested_game_ids, open_manifest, record_game, record_games)
     parser = argparse.ArgumentParser()
     parser.add_argument("input_file", default="data/250203_pbp_gt.parquet")
     parser.add_argument("output_file",default="data/new_pbp.parquet")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=4.0, help="maximum requests per second")
+    parser.add_argument("--stream", action="store_true", help="write each game to output_file as it is fetched")
+    parser.add_argument("--partitioned", action="store_true", help="with --stream, write one file per game into the output_file directory")
+    parser.add_argument("--manifest", default=None, help="ingested games manifest (default: pbp_manifest.sqlite next to input_file)")
     args = parser.parse_args()
     parquet_file = args.input_file
 
-    if os.path.exists(parquet_file):
-        existing_data = pq.read_table(parquet_file).to_pandas()
-        #print(existing_data.columns)
-        existing_game_ids = list(map(int,existing_data['game_id'].unique()))
-        existing_game_ids = ["00"+str(game_id) for game_id in existing_game_ids]
-        #print(existing_game_ids[:5])
-    #print(games['GAME_ID'].unique())
+    # The manifest records every ingested game, so only the first run against an input file
+    # has to read it (and then only its game_id column)
+    manifest = open_manifest(args.manifest or default_manifest_path(parquet_file))
+    if os.path.exists(parquet_file) and not has_source(manifest, parquet_file):
+        n_existing = bootstrap_from_parquet(manifest, parquet_file)
+        print(f"Added {n_existing} games from {parquet_file} to the manifest")
+    existing_game_ids = ingested_game_ids(manifest)
     new_game_ids = [game_id for game_id in games['GAME_ID'].unique() if game_id not in existing_game_ids]
-    #print(new_game_ids[:5])
-    #print(existing_game_ids[:5])
-    #print(len(new_game_ids))
-    new_game_data = pbp_raw(new_game_ids)
-    new_game_data.columns = new_game_data.columns.str.lower()
-    new_game_table = pa.Table.from_pandas(new_game_data)
-    
-    pq.write_table(new_game_table, args.output_file)
-    print(f"Saved new play-by-play data to {args.output_file}")
-
-    
+    print(f"{len(new_game_ids)} new games to fetch")
+    if args.stream and args.partitioned:
+        # each game file is complete once written, so it is recorded straight away
+        n_games = pbp_stream(new_game_ids, args.output_file, partitioned=True,
+                             on_game=lambda game_id, n_rows: record_game(manifest, game_id, n_rows, source=args.output_file),
+                             max_concurrency=args.concurrency, requests_per_second=args.rate)
+        print(f"Saved {n_games} games of new play-by-play data to {args.output_file}")
+    elif args.stream:
+        # the single file only holds the new games once the writer has closed and replaced it,
+        # so they are recorded afterwards (also after an error, when the finished games are kept)
+        written = []
+        try:
+            n_games = pbp_stream(new_game_ids, args.output_file, on_game=lambda game_id, n_rows: written.append((game_id, n_rows)),
+                                 max_concurrency=args.concurrency, requests_per_second=args.rate)
+            print(f"Saved {n_games} games of new play-by-play data to {args.output_file}")
+        finally:
+            record_games(manifest, written, source=args.output_file)
+    else:
+        new_game_data = pbp_raw(new_game_ids, max_concurrency=args.concurrency, requests_per_second=args.rate)
+        new_game_data.columns = new_game_data.columns.str.lower()
+
+        # appended to what output_file already holds: the manifest keeps its earlier games as ingested
+        with pbp_appender(args.output_file) as writer:
+            writer.write_table(pbp_table(new_game_data))
+        print(f"Saved new play-by-play data to {args.output_file}")
+        if len(new_game_data):
+            record_games(manifest, new_game_data.groupby('game_id').size().items(), source=args.output_file)
+    manifest.close()
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Small SQLite sidecar recording which games have already been ingested, so incremental runs
+# can find new games with set lookups instead of deserialising the whole play-by-play file.
+
+
+def default_manifest_path(parquet_file):
+    return os.path.join(os.path.dirname(parquet_file) or '.', 'pbp_manifest.sqlite')
+
+
+def normalise_game_id(game_id):
+    # parquet files store game_id as int/float (22400001), the API uses '0022400001'
+    return str(int(float(game_id))).zfill(10)
+
+
+def open_manifest(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS games ('
+                 'game_id TEXT PRIMARY KEY, fetched_at TEXT NOT NULL, n_rows INTEGER NOT NULL, source TEXT)')
+    return conn
+
+
+def record_games(conn, games, source=None, fetched_at=None):
+    # games: iterable of (game_id, n_rows)
+    fetched_at = fetched_at or datetime.now(timezone.utc).isoformat(timespec='seconds')
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?)',
+                         [(normalise_game_id(game_id), fetched_at, int(n_rows), source) for game_id, n_rows in games])
+
+
+def record_game(conn, game_id, n_rows, source=None):
+    record_games(conn, [(game_id, n_rows)], source=source)
+
+
+def ingested_game_ids(conn):
+    return {game_id for (game_id,) in conn.execute('SELECT game_id FROM games')}
+
+
+def has_source(conn, source):
+    return conn.execute('SELECT 1 FROM games WHERE source = ? LIMIT 1', (source,)).fetchone() is not None
+
+
+def bootstrap_from_parquet(conn, parquet_file):
+    # One-off import of an existing play-by-play file (or directory of files); only the
+    # game_id column is read.
+    game_ids = pq.read_table(parquet_file, columns=['game_id'])['game_id']
+    counts = pc.value_counts(game_ids.drop_null())
+    games = zip(counts.field('values').to_pylist(), counts.field('counts').to_pylist())
+    record_games(conn, games, source=parquet_file)
+    return len(counts)
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Runs the Python side of the project as a DAG:
+#   format (one stage per season) -> merge -> cluster -> project / dashboard artifacts
+#   (position lookup); the cluster stage also writes the shared feature store
+# Fetching new play-by-play is not a stage: pbp_data_initial.py pulls the raw playbyplayv2 rows,
+# and the R cleaning step (data_cleaning.r) builds the <yy_yy>_combined_pbp files with lineups
+# that the format and lineup-ratings stages read. `make pipeline` runs both before this DAG.
+# A stage is skipped when the content hashes of its inputs (data files and the code files it
+# runs) and its parameters match the last successful run and its outputs still exist. Stages
+# whose dependencies are done run concurrently. The R stages (data_cleaning.r, GenerateModel.r)
+# are still driven by the Makefile.
+STATE_PATH = 'data/.pipeline_state.json'
+
+
+class Stage:
+    # run(*args) does the work. process=True runs it in a worker process (for CPU-bound Python
+    # stages; run must then be a module-level function), otherwise in a thread. always=True
+    # stages (e.g. the cluster stage with --refit-clusters) run every time; their outputs are still
+    # hashed, so downstream stages only re-run when the outputs actually changed.
+    def __init__(self, name, run, args=(), inputs=(), outputs=(), params=None, deps=(), process=False, always=False):
+        self.name = name
+        self.run = run
+        self.args = tuple(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.deps = list(deps)
+        self.process = process
+        self.always = always
+
+
+def run_script(*argv, env=None):
+    # Runs one of the Milestone2 scripts (many have spaces in their names) with this interpreter
+    subprocess.run([sys.executable, *argv], check=True, env={**os.environ, 'MPLBACKEND': 'Agg', **(env or {})})
+
+
+class FileHashes:
+    # sha256 of file (or directory) contents, remembered by (size, mtime) so unchanged files are
+    # not re-read on every run
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self.lock = threading.Lock()
+
+    def file_digest(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.known.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with self.lock:
+            self.known[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, path):
+        if not os.path.exists(path):
+            return None
+        if not os.path.isdir(path):
+            return self.file_digest(path)
+        sha = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                sha.update(os.path.relpath(file_path, path).encode())
+                sha.update(self.file_digest(file_path).encode())
+        return sha.hexdigest()
+
+
+def fingerprint(stage, hashes):
+    description = {
+        'inputs': {path: hashes.digest(path) for path in stage.inputs},
+        'params': stage.params,
+        'args': [repr(arg) for arg in stage.args],
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(stages, state_path=STATE_PATH, workers=4, force=(), only=None):
+    # Returns {stage name: 'ran' | 'skipped' | 'failed' | 'blocked'}
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+    if only is not None:
+        # the requested stages and everything they depend on
+        wanted, todo = set(), list(only)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(by_name[name].deps)
+        stages = [stage for stage in stages if stage.name in wanted]
+
+    state = load_state(state_path)
+    hashes = FileHashes(state.get('files'))
+    status = {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+
+    def execute(stage, processes):
+        fp = fingerprint(stage, hashes)
+        outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+        if not stage.always and stage.name not in force and outputs_exist and state['stages'].get(stage.name) == fp:
+            return 'skipped', fp, 0.0
+        start = time.perf_counter()
+        if stage.process:
+            processes.submit(stage.run, *stage.args).result()
+        else:
+            stage.run(*stage.args)
+        return 'ran', fp, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as threads, ProcessPoolExecutor(max_workers=workers) as processes:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                dep_status = [status.get(dep) for dep in stage.deps]
+                if any(s in ('failed', 'blocked') for s in dep_status):
+                    status[name] = 'blocked'
+                    print(f"[{name}] blocked by a failed dependency")
+                    del pending[name]
+                elif all(s in ('ran', 'skipped') for s in dep_status):
+                    running[threads.submit(execute, stage, processes)] = stage
+                    del pending[name]
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between stages {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    result, fp, elapsed = future.result()
+                except Exception as e:
+                    status[stage.name] = 'failed'
+                    print(f"[{stage.name}] failed: {e!r}")
+                    continue
+                status[stage.name] = result
+                if result == 'ran':
+                    state['stages'][stage.name] = fp
+                    print(f"[{stage.name}] ran in {elapsed:.1f}s")
+                else:
+                    print(f"[{stage.name}] up to date")
+            with hashes.lock:
+                state['files'] = dict(hashes.known)
+            save_state(state, state_path)
+    return status
+
+
+def default_stages(seasons=None, data_dir='data', refit_clusters=False):
+    from clustering import CLUSTERS_PATH, HEATMAP_PATH, MODEL_PATH, update_player_clusters
+    from merged_stats import SEASONS, build_season, combine_seasons, combined_path, season_paths
+    from lineup_ratings import LINEUP_TABLE_PATH, update_lineup_table
+    from dashboard_data import SHARED_TABLE_PATH, SIMILAR_PLAYERS_PATH, build_similar_players, shared_frame
+    from player_lookup import LOOKUP_PATH, refresh_if_stale
+    from feature_store import STORE_DIR
+
+    seasons = seasons or SEASONS
+    stages = []
+    format_code = ['merged_stats.py', 'formatting_engine.py', 'lineup_encoding.py', 'data_access.py']
+    for season in seasons:
+        paths = season_paths(season, data_dir)
+        stages.append(Stage(f'format-{season}', build_season, args=(season, data_dir), process=True,
+                            inputs=[path for key, path in paths.items() if key != 'output'] + format_code,
+                            outputs=[paths['output']]))
+
+    # lineup totals only read games they have not counted yet, so re-running on a changed file is cheap
+    pbp_files = [season_paths(season, data_dir)['play_by_play'] for season in seasons]
+    stages.append(Stage('lineup-ratings', update_lineup_table, args=(pbp_files, LINEUP_TABLE_PATH), process=True,
+                        inputs=pbp_files + ['lineup_ratings.py', 'lineup_encoding.py', 'data_access.py'],
+                        outputs=[LINEUP_TABLE_PATH]))
+
+    merged_outputs = [season_paths(season, data_dir)['output'] for season in seasons]
+    combined = combined_path(seasons, data_dir)
+    stages.append(Stage('merge', combine_seasons, args=(merged_outputs, combined), inputs=merged_outputs,
+                        outputs=[combined], deps=[f'format-{season}' for season in seasons]))
+
+    # new or changed player-seasons are assigned to the stored clusters; Ward is refitted on every
+    # season only with refit_clusters (or when nothing is stored yet)
+    stages.append(Stage('cluster', update_player_clusters,
+                        args=(seasons, data_dir, CLUSTERS_PATH, HEATMAP_PATH, STORE_DIR, MODEL_PATH, refit_clusters),
+                        process=True, inputs=merged_outputs + ['clustering.py', 'data_access.py', 'feature_store.py'],
+                        outputs=[CLUSTERS_PATH, HEATMAP_PATH, STORE_DIR, MODEL_PATH], deps=['merge'],
+                        always=refit_clusters))
+
+    stages.append(Stage('project-pca', run_script, args=('PCA clustering.py',),
+                        inputs=[CLUSTERS_PATH, STORE_DIR, 'PCA clustering.py', 'projection.py'], outputs=['PCA_Clustering2.png'], deps=['cluster']))
+    stages.append(Stage('project-umap', run_script, args=('UMAP.py',),
+                        inputs=[CLUSTERS_PATH, STORE_DIR, 'UMAP.py', 'projection.py'], outputs=['UMAP2.png'], deps=['cluster']))
+
+    # the lookup goes stale with age rather than with its inputs, so the stage runs every time and
+    # refresh_if_stale only rebuilds it when it is missing, older than player_lookup.MAX_AGE or short a season
+    stages.append(Stage('dashboard-positions', refresh_if_stale, args=(seasons, LOOKUP_PATH),
+                        inputs=['player_lookup.py'], params={'seasons': seasons}, outputs=[LOOKUP_PATH], deps=['cluster'],
+                        always=True))
+    # memory-mapped Arrow copy of the clusters file that the dashboard's gunicorn workers share
+    stages.append(Stage('dashboard-table', shared_frame, args=(CLUSTERS_PATH, SHARED_TABLE_PATH),
+                        inputs=[CLUSTERS_PATH, 'dashboard_data.py', 'data_access.py'], outputs=[SHARED_TABLE_PATH],
+                        deps=['cluster']))
+    # every player-season's preformatted nearest neighbours for the similar-players table
+    stages.append(Stage('dashboard-similar', build_similar_players, args=(CLUSTERS_PATH, SIMILAR_PLAYERS_PATH),
+                        inputs=[CLUSTERS_PATH, STORE_DIR, 'dashboard_data.py', 'similarity_index.py'],
+                        outputs=[SIMILAR_PLAYERS_PATH], deps=['cluster']))
+    return stages
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seasons', nargs='*', default=None)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--force', nargs='*', default=[], help="stages to re-run even if up to date")
+    parser.add_argument('--only', nargs='*', default=None, help="run only these stages (and their dependencies)")
+    parser.add_argument('--refit-clusters', action='store_true', help="refit Ward clustering on every season")
+    args = parser.parse_args()
+
+    stages = default_stages(args.seasons, args.data_dir, refit_clusters=args.refit_clusters)
+    status = run_pipeline(stages, os.path.join(args.data_dir, os.path.basename(STATE_PATH)), args.workers,
+                          force=set(args.force), only=args.only)
+    if any(s in ('failed', 'blocked') for s in status.values()):
+        sys.exit(1)
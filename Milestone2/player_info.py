@@ -1,56 +1,25 @@
-def player_info(seasons):
+def player_info(seasons, max_concurrency=8, **client_kwargs):
     import asyncio
-    import aiohttp
     import pandas as pd
-    from nba_api.stats.endpoints import leaguegamefinder
-    import os
-    
-
-    # Get all games for the season
-    
-
-    headers = {'Connection': 'keep-alive',
-            'Host': 'stats.nba.com',
-            'Origin': 'http://stats.nba.com',
-            'Upgrade-Insecure-Requests': '1',
-            'Referer': 'https://stats.nba.com',
-            'x-nba-stats-origin': 'stats',
-            'x-nba-stats-token': 'true',
-            'Accept-Language': 'en-US,en;q=0.5',
-            "Accept": "application/json, text/plain, */*",
-            "X-NewRelic-ID": "VQECWF5UChAHUlNTBwgBVw==",
-            'User-Agent': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) " + \
-                            "AppleWebKit/537.36 (KHTML, like Gecko) " + \
-                            "Chrome/84.0.4147.89 Safari/537.36"}
+    from nba_client import result_set_records, run
 
 
-    async def fetch_play_by_play(session, season):
-        url = f"https://stats.nba.com/stats/draftcombineplayeranthro?LeagueID=00&SeasonYear={season}"
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                df =  pd.DataFrame(data['resultSets'][0]['rowSet'], columns=data['resultSets'][0]['headers'])
-                print(f"Processed game {season} with {len(df)} rows")
-                return df
-            else:
-                print(f"Error fetching play-by-play data for game {season} from {url}: {response.status}")
-                return pd.DataFrame()
+    # All seasons are requested at once (the client keeps at most max_concurrency in flight)
+    # and the rows are collected as records, so the DataFrame is built once at the end
+    async def fetch_anthro(client, season):
+        data = await client.get('draftcombineplayeranthro', {'LeagueID': '00', 'SeasonYear': season})
+        if data is None:
+            return []
+        records = result_set_records(data)
+        print(f"Processed season {season} with {len(records)} rows")
+        return records
 
-    async def main():
-        async with aiohttp.ClientSession() as session:
-            total_player_data = pd.DataFrame()
-            for season in seasons:
-                player_data = await fetch_play_by_play(session, season)
-                total_player_data = pd.concat([total_player_data, player_data], ignore_index=True)
-            # Concatenate all play-by-play data into a single DataFrame
-            return total_player_data
-            
-            
-            # Save to a parquet file
-            
+    async def main(client):
+        season_records = await asyncio.gather(*(fetch_anthro(client, season) for season in seasons))
+        return pd.DataFrame([record for records in season_records for record in records])
 
     # Run the main function
-    result = asyncio.run(main())
+    result = run(main, max_concurrency=max_concurrency, **client_kwargs)
     return result
 
 if __name__ == '__main__':
@@ -1,52 +1,25 @@
-def player_heights(players):
+def player_heights(players, max_concurrency=8, **client_kwargs):
     import asyncio
-    import aiohttp
     import pandas as pd
-    from nba_api.stats.endpoints import leaguegamefinder
-    import os
-    
-
-    # Get all games for the season
-    
+    from nba_client import result_set_records, run
 
-    headers = {'Connection': 'keep-alive',
-            'Host': 'stats.nba.com',
-            'Origin': 'http://stats.nba.com',
-            'Upgrade-Insecure-Requests': '1',
-            'Referer': 'https://stats.nba.com',
-            'x-nba-stats-origin': 'stats',
-            'x-nba-stats-token': 'true',
-            'Accept-Language': 'en-US,en;q=0.5',
-            "Accept": "application/json, text/plain, */*",
-            "X-NewRelic-ID": "VQECWF5UChAHUlNTBwgBVw==",
-            'User-Agent': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) " + \
-                            "AppleWebKit/537.36 (KHTML, like Gecko) " + \
-                            "Chrome/84.0.4147.89 Safari/537.36"}
 
+    # Same pattern as player_info: every player is requested concurrently and the heights are
+    # collected as records before building a single DataFrame
+    async def fetch_heights(client, player):
+        data = await client.get('commonplayerinfo', {'LeagueID': '', 'PlayerID': player})
+        if data is None:
+            return None
+        rows = result_set_records(data)
+        if not rows:
+            return None
+        return {'PLAYER_ID': player, 'HEIGHT': rows[0]['HEIGHT']}
 
-    async def fetch_heights(session, player):
-        url = f"https://stats.nba.com/stats/commonplayerinfo?LeagueID=&PlayerID={player}"
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                row =  pd.DataFrame(data['resultSets'][0]['rowSet'], columns=data['resultSets'][0]['headers'])
-                height = row['HEIGHT'].values[0]
-                value = {'PLAYER_ID': player, 'HEIGHT': height}
-                df = pd.DataFrame([value])
-                return df
-            else:
-                return pd.DataFrame()
+    async def main(client):
+        records = await asyncio.gather(*(fetch_heights(client, player) for player in players))
+        return pd.DataFrame([record for record in records if record is not None], columns=['PLAYER_ID', 'HEIGHT'])
 
-    async def main():
-        async with aiohttp.ClientSession() as session:
-            total_player_data = pd.DataFrame()
-            for player in players:
-                player_data = await fetch_heights(session, player)
-                total_player_data = pd.concat([total_player_data, player_data], ignore_index=True)
-            # Concatenate all play-by-play data into a single DataFrame
-            return total_player_data
-            
-    result = asyncio.run(main())
+    result = run(main, max_concurrency=max_concurrency, **client_kwargs)
     return result
 
 if __name__ == '__main__':
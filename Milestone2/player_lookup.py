@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Local PERSON_ID x SEASON -> POSITION table built from stats.nba.com playerindex, so the
+# dashboard can merge positions at startup without touching the network.
+LOOKUP_PATH = 'data/player_positions.parquet'
+LOOKUP_COLUMNS = ['PERSON_ID', 'SEASON', 'POSITION']
+MAX_AGE = 24 * 60 * 60
+CHECK_INTERVAL = 60 * 60
+
+
+def fetch_player_positions(seasons, max_concurrency=4):
+    import asyncio
+    from nba_client import result_set_records, run
+
+    async def fetch_player_index(client, season):
+        params = {'Active': '', 'AllStar': '', 'College': '', 'Country': '', 'DraftPick': '', 'DraftRound': '',
+                  'DraftYear': '', 'Height': '', 'Historical': '', 'LeagueID': '00', 'Season': season,
+                  'TeamID': 0, 'Weight': ''}
+        data = await client.get('playerindex', params)
+        if data is None:
+            return []
+        return [{'PERSON_ID': record['PERSON_ID'], 'SEASON': season, 'POSITION': record['POSITION']}
+                for record in result_set_records(data)]
+
+    async def main(client):
+        season_records = await asyncio.gather(*(fetch_player_index(client, season) for season in seasons))
+        return pd.DataFrame([record for records in season_records for record in records], columns=LOOKUP_COLUMNS)
+
+    return run(main, max_concurrency=max_concurrency)
+
+
+def build_player_lookup(seasons, path=LOOKUP_PATH):
+    lookup = fetch_player_positions(sorted(set(seasons)))
+    lookup['PERSON_ID'] = lookup['PERSON_ID'].astype('int64')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    lookup.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    print(f"Saved {len(lookup)} player positions for {lookup['SEASON'].nunique()} seasons to {path}")
+    return lookup
+
+
+def load_player_lookup(path=LOOKUP_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame({'PERSON_ID': pd.Series(dtype='int64'), 'SEASON': pd.Series(dtype=object),
+                             'POSITION': pd.Series(dtype=object)})
+    return pd.read_parquet(path, columns=LOOKUP_COLUMNS)
+
+
+def lookup_is_stale(seasons, path=LOOKUP_PATH, max_age=MAX_AGE):
+    if not os.path.exists(path):
+        return True
+    if time.time() - os.path.getmtime(path) > max_age:
+        return True
+    have = set(pd.read_parquet(path, columns=['SEASON'])['SEASON'])
+    return not set(seasons) <= have
+
+
+def add_positions(df, lookup):
+    # Positions are matched per season, so a player keeps the listing of each season they played
+    df = df.drop(columns=['POSITION', 'positions'], errors='ignore')
+    df = df.merge(lookup[['PERSON_ID', 'SEASON', 'POSITION']], left_on=['PLAYER_ID', 'SEASON'],
+                  right_on=['PERSON_ID', 'SEASON'], how='left').drop(columns='PERSON_ID')
+    df['positions'] = df['POSITION']
+    return df
+
+
+def refresh_if_stale(seasons, path=LOOKUP_PATH, max_age=MAX_AGE):
+    # Rebuilds the lookup when it is missing or stale and returns the new table, else None. A lock
+    # file next to the lookup lets one process rebuild at a time; the others skip this check and
+    # find the file fresh on their next one.
+    import fcntl
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if not lookup_is_stale(seasons, path, max_age):
+            return None
+        return build_player_lookup(seasons, path)
+
+
+def refresh_in_background(seasons, on_refresh=None, path=LOOKUP_PATH, max_age=MAX_AGE, interval=CHECK_INTERVAL):
+    # Re-checks the lookup every interval seconds on a daemon thread, for as long as the process
+    # runs, and hands each rebuilt table to on_refresh; returns the thread
+    def refresh():
+        while True:
+            try:
+                lookup = refresh_if_stale(seasons, path, max_age)
+            except Exception as e:
+                print(f"Player lookup refresh failed: {e!r}")
+                lookup = None
+            if lookup is not None and on_refresh is not None:
+                on_refresh(lookup)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=refresh, name='player-lookup-refresh', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('seasons', nargs='*', help="seasons like 2024-25 (default: every SEASON in the clusters file)")
+    parser.add_argument('--clusters', default='data/21-25player_clusters.parquet')
+    parser.add_argument('--output', default=LOOKUP_PATH)
+    args = parser.parse_args()
+    seasons = args.seasons or pd.read_parquet(args.clusters, columns=['SEASON'])['SEASON'].unique().tolist()
+    build_player_lookup(seasons, args.output)
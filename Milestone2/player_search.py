@@ -0,0 +1,127 @@
+import bisect
+from collections import Counter, defaultdict
+
+from lineup_encoding import normalise_name
+
+# In-memory player lookup for the dashboard: (PLAYER_ID, season) -> row, plus a sorted prefix list
+# and a trigram index over the distinct names, so autocomplete and typo-tolerant matches never scan
+# the DataFrame. Built once from the key columns (same row order as df). Players whose names
+# normalise the same are told apart by their PLAYER_ID: they are suggested as 'Name (PLAYER_ID)',
+# and only those labels, not the shared name, resolve to one of them.
+MIN_SIMILARITY = 0.3
+
+
+def trigrams(name):
+    # Padded so short names and word starts count: 'jok' -> {'  j', ' jo', 'jok', 'ok '}
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlayerSearch:
+    def __init__(self, player_names, seasons, player_ids=None):
+        if player_ids is None:
+            # without IDs every normalised name counts as one player
+            player_ids = [normalise_name(name) for name in player_names]
+        self.rows = {}
+        self.seasons = defaultdict(list)
+        players = defaultdict(dict)
+        for row, (name, season, player_id) in enumerate(zip(player_names, seasons, player_ids)):
+            self.rows[(player_id, season)] = row
+            self.seasons[player_id].append(season)
+            players[normalise_name(name)].setdefault(player_id, name)
+        for player_id in self.seasons:
+            self.seasons[player_id] = sorted(set(self.seasons[player_id]))
+
+        # normalised label -> (label, PLAYER_ID), and the labels of every normalised name
+        self.labels = {}
+        self.players = {}
+        for key, names in players.items():
+            labels = [f"{name} ({player_id})" if len(names) > 1 else name for player_id, name in names.items()]
+            for label, player_id in zip(labels, names):
+                self.labels[normalise_name(label)] = (label, player_id)
+            self.players[key] = labels
+
+        self.names = sorted(self.players)
+        # every word of a name is a prefix entry, so 'jok' finds 'nikola jokic' too; a shared name's
+        # labels are entries as well, so typing the PLAYER_ID narrows the suggestions
+        self.prefixes = sorted((word, name) for name in self.names
+                               for word in {name, *name.split(' '), *map(normalise_name, self.players[name])})
+        self.trigram_index = defaultdict(list)
+        for name in self.names:
+            for gram in trigrams(name):
+                self.trigram_index[gram].append(name)
+
+    @classmethod
+    def from_keys(cls, keys):
+        return cls(keys['player_name'], keys['SEASON'], keys['PLAYER_ID'])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def player_id(self, player):
+        # PLAYER_ID for a name or 'Name (PLAYER_ID)' label, None when unknown or shared by several players
+        entry = self.labels.get(normalise_name(player))
+        return entry[1] if entry else None
+
+    def row(self, player, season):
+        # None when the player has no row for that season
+        return self.rows.get((self.player_id(player), season))
+
+    def player_seasons(self, player):
+        return self.seasons.get(self.player_id(player), [])
+
+    def prefix_matches(self, text, limit):
+        start = bisect.bisect_left(self.prefixes, (text,))
+        matches = []
+        for word, name in self.prefixes[start:]:
+            if not word.startswith(text) or len(matches) >= limit:
+                break
+            if name not in matches:
+                matches.append(name)
+        return matches
+
+    def fuzzy_matches(self, text, limit, min_similarity=MIN_SIMILARITY):
+        # Names ranked by trigram overlap (Dice coefficient), best first
+        grams = trigrams(text)
+        shared = Counter(name for gram in grams for name in self.trigram_index.get(gram, ()))
+        scored = [(2 * count / (len(grams) + len(trigrams(name))), name) for name, count in shared.items()]
+        scored = sorted((item for item in scored if item[0] >= min_similarity), key=lambda item: (-item[0], item[1]))
+        return [name for _, name in scored[:limit]]
+
+    def suggest(self, text, limit=10):
+        # Labels for a partial or misspelt name: prefix matches first, then fuzzy ones; a name shared
+        # by several players lists each of their labels
+        text = normalise_name(text or '')
+        if not text:
+            return []
+        matches = self.prefix_matches(text, limit)
+        if len(matches) < limit:
+            matches += [name for name in self.fuzzy_matches(text, limit) if name not in matches][:limit - len(matches)]
+        return [label for name in matches for label in self.players[name]][:limit]
+
+    def resolve(self, text):
+        # Label of the exact (normalised) match, else of the closest fuzzy match; None when nothing
+        # matches or the name is shared, as the player it means cannot be told from the text
+        key = normalise_name(text or '')
+        if key in self.labels:
+            return self.labels[key][0]
+        matches = [key] if key in self.players else self.fuzzy_matches(key, 1) if key else []
+        if not matches or len(self.players[matches[0]]) > 1:
+            return None
+        return self.players[matches[0]][0]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import pandas as pd
+
+    from feature_store import KEY_COLUMNS, SOURCE_PATH
+    parser = argparse.ArgumentParser()
+    parser.add_argument('text')
+    parser.add_argument('--source', default=SOURCE_PATH)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+    search = PlayerSearch.from_keys(pd.read_parquet(args.source, columns=KEY_COLUMNS))
+    for name in search.suggest(args.text, args.limit):
+        print(f"{name}: {', '.join(search.player_seasons(name))}")
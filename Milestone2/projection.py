@@ -0,0 +1,121 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_store import SOURCE_PATH, STORE_DIR, load_or_build
+
+# Fit-once 2-D projections of the feature store for PCA clustering.py and UMAP.py. The fitted
+# reducer is saved with the scaler it was fitted under (data/projections/<method>.joblib) and the
+# projected rows are kept in <method>.parquet. Later runs only transform() player-seasons that are
+# new or whose features changed, so adding a season does not refit on every earlier one.
+# 'kpca-nystroem' approximates the sigmoid KernelPCA with a fixed number of landmark rows, so
+# memory grows with n x landmarks instead of n x n. It is an approximation at any number of
+# landmarks: the sigmoid kernel is not positive semi-definite, so its Nystroem features do not
+# reproduce KernelPCA's embedding even with every row as a landmark.
+PROJECTION_DIR = 'data/projections'
+METHODS = ('umap', 'kpca', 'kpca-nystroem')
+LANDMARKS = 1000
+BATCH_ROWS = 4096
+RANDOM_STATE = 0
+
+
+def make_reducer(method, n_rows, landmarks=LANDMARKS):
+    if method == 'umap':
+        import umap
+        return umap.UMAP(n_components=2)
+    if method == 'kpca':
+        from sklearn.decomposition import KernelPCA
+        return KernelPCA(n_components=2, kernel='sigmoid')
+    if method == 'kpca-nystroem':
+        from sklearn.decomposition import PCA
+        from sklearn.kernel_approximation import Nystroem
+        from sklearn.pipeline import make_pipeline
+        return make_pipeline(Nystroem(kernel='sigmoid', n_components=min(landmarks, n_rows), random_state=RANDOM_STATE),
+                             PCA(n_components=2))
+    raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+
+
+def projection_paths(method, projection_dir=PROJECTION_DIR):
+    return {
+        'reducer': os.path.join(projection_dir, f'{method}.joblib'),
+        'meta': os.path.join(projection_dir, f'{method}.json'),
+        'points': os.path.join(projection_dir, f'{method}.parquet'),
+    }
+
+
+def transform_rows(reducer, X, batch_rows=BATCH_ROWS):
+    # Batches keep the kernel block for new rows at batch_rows x (training rows or landmarks)
+    if len(X) == 0:
+        return np.empty((0, 2))
+    return np.vstack([reducer.transform(X[start:start + batch_rows]) for start in range(0, len(X), batch_rows)])
+
+
+def fit_projection(store, method, projection_dir=PROJECTION_DIR, landmarks=LANDMARKS):
+    X = np.asarray(store.matrix)
+    reducer = make_reducer(method, len(X), landmarks)
+    points = reducer.fit_transform(X)
+    paths = projection_paths(method, projection_dir)
+    os.makedirs(projection_dir, exist_ok=True)
+    joblib.dump(reducer, paths['reducer'])
+    meta = {'columns': store.columns, 'mean': store.mean.tolist(), 'scale': store.scale.tolist(),
+            'rows': len(X), 'landmarks': landmarks}
+    tmp_path = f"{paths['meta']}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, paths['meta'])
+    return reducer, points
+
+
+def project(store=None, method='kpca-nystroem', projection_dir=PROJECTION_DIR, refit=False, landmarks=LANDMARKS):
+    # 2-D coordinates for every row of the feature store (same order), as a DataFrame with the row
+    # keys plus x/y. Fits only when there is no saved reducer for method (or it was fitted on other
+    # columns or, for kpca-nystroem, another number of landmarks), or refit=True
+    if store is None:
+        store = load_or_build(SOURCE_PATH, STORE_DIR)
+    paths = projection_paths(method, projection_dir)
+    keys = store.keys
+    # the store's hash of each row's raw features tells which player-seasons are new or changed
+    hashes = store.row_hash
+
+    fitted = not refit and all(os.path.exists(path) for path in paths.values())
+    if fitted:
+        with open(paths['meta']) as f:
+            meta = json.load(f)
+        fitted = meta['columns'] == store.columns and (method != 'kpca-nystroem' or meta['landmarks'] == landmarks)
+    if not fitted:
+        reducer, points = fit_projection(store, method, projection_dir, landmarks)
+        print(f"Fitted {method} on {len(points)} player-seasons")
+    else:
+        reducer = joblib.load(paths['reducer'])
+        previous = pd.read_parquet(paths['points'])
+        key_columns = list(keys.columns)
+        previous = previous.drop_duplicates(subset=key_columns, keep='last')
+        previous = keys.assign(row_hash=hashes).merge(previous, on=key_columns + ['row_hash'], how='left')
+        points = np.array(previous[['x', 'y']], dtype=np.float64)
+        new = np.isnan(points).any(axis=1)
+        if new.any():
+            # standardise with the scaler the reducer was fitted under, not the current one
+            raw = store.inverse_transform(store.matrix[new])
+            X_new = (raw - np.asarray(meta['mean'])) / np.asarray(meta['scale'])
+            points[new] = transform_rows(reducer, X_new.astype(np.float32))
+        print(f"Projected {int(new.sum())} new or changed of {len(points)} player-seasons with the saved {method}")
+
+    result = keys.assign(row_hash=hashes, x=points[:, 0], y=points[:, 1])
+    tmp_path = f"{paths['points']}.tmp"
+    result.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, paths['points'])
+    return result.drop(columns='row_hash'), reducer
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('method', choices=METHODS)
+    parser.add_argument('--refit', action='store_true', help="refit the reducer on every row")
+    parser.add_argument('--landmarks', type=int, default=LANDMARKS)
+    parser.add_argument('--projection-dir', default=PROJECTION_DIR)
+    args = parser.parse_args()
+    project(None, args.method, args.projection_dir, args.refit, args.landmarks)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from feature_store import SOURCE_PATH, STORE_DIR, FeatureStore
+from feature_store import load_or_build as load_feature_store
+
+# Player-season similarity index over the feature store's standardised float32 matrix (plus
+# unit-length copies for cosine). Queries are an exact top-k with argpartition, so there is no
+# refitting of a scaler or full argsort per lookup.
+METRICS = ('euclidean', 'cosine')
+BATCH_ROWS = 1024
+
+
+def top_k(scores, k, largest=False):
+    # Row-wise indices of the k smallest (or largest) scores, best first
+    k = min(k, scores.shape[-1])
+    if largest:
+        scores = -scores
+    part = np.argpartition(scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(np.take_along_axis(scores, part, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class SimilarityIndex:
+    def __init__(self, store):
+        self.store = store
+        self.vectors = store.matrix
+        norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.unit = np.ascontiguousarray(self.vectors / np.where(norms == 0, 1, norms), dtype=np.float32)
+        self.sq_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.keys = store.keys
+        # (player_name, SEASON) -> row
+        self.rows = {key: i for i, key in enumerate(zip(self.keys['player_name'], self.keys['SEASON']))}
+
+    @classmethod
+    def build(cls, df):
+        return cls(FeatureStore.build(df))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def row(self, player_name, season):
+        # None when the player has no row for that season
+        return self.rows.get((player_name, season))
+
+    def scores(self, queries, metric='euclidean'):
+        # Squared euclidean distances (smaller is closer) or cosine similarities (larger is closer)
+        # between standardised query vectors and every row
+        if metric == 'cosine':
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            return (queries / np.where(norms == 0, 1, norms)) @ self.unit.T
+        if metric != 'euclidean':
+            raise ValueError(f"metric must be one of {METRICS}, got {metric!r}")
+        return self.sq_norms - 2 * (queries @ self.vectors.T) + np.einsum('ij,ij->i', queries, queries)[:, None]
+
+    def query(self, vector, k=3, metric='euclidean', exclude=None):
+        # Top-k rows for one standardised vector as (row indices, distances or similarities)
+        scores = self.scores(np.atleast_2d(vector).astype(np.float32), metric)[0]
+        if exclude is not None:
+            scores[exclude] = -np.inf if metric == 'cosine' else np.inf
+        rows = top_k(scores, k, largest=metric == 'cosine')
+        values = scores[rows]
+        return rows, values if metric == 'cosine' else np.sqrt(np.maximum(values, 0))
+
+    def similar(self, player_name, season, k=3, metric='euclidean', include_self=False):
+        # Top-k player-seasons for a player-season in the index, or None if it isn't there
+        row = self.row(player_name, season)
+        if row is None:
+            return None
+        rows, values = self.query(self.vectors[row], k, metric, exclude=None if include_self else row)
+        result = self.keys.iloc[rows].reset_index(drop=True)
+        result['distance' if metric == 'euclidean' else 'similarity'] = values
+        return result
+
+    def all_neighbours(self, k=3, metric='euclidean', batch_rows=BATCH_ROWS):
+        # Every row's top-k (excluding itself) as two (n, k) arrays, computed in blocks of rows
+        # so the n x n score matrix is never held at once
+        n = len(self)
+        k = min(k, n - 1)
+        neighbours = np.empty((n, k), dtype=np.int64)
+        values = np.empty((n, k), dtype=np.float32)
+        for start in range(0, n, batch_rows):
+            stop = min(start + batch_rows, n)
+            block_scores = self.scores(self.vectors[start:stop], metric)
+            block_scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf if metric == 'cosine' else np.inf
+            rows = top_k(block_scores, k, largest=metric == 'cosine')
+            neighbours[start:stop] = rows
+            values[start:stop] = np.take_along_axis(block_scores, rows, axis=1)
+        if metric == 'euclidean':
+            values = np.sqrt(np.maximum(values, 0))
+        return neighbours, values
+
+
+def load_or_build(source=SOURCE_PATH, store_dir=STORE_DIR):
+    return SimilarityIndex(load_feature_store(source, store_dir))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('player_name', nargs='?', default='LeBron James')
+    parser.add_argument('season', nargs='?', default='2024-25')
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--metric', choices=METRICS, default='euclidean')
+    parser.add_argument('--source', default=SOURCE_PATH)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+    index = load_or_build(args.source, args.store_dir)
+    similar = index.similar(args.player_name, args.season, args.k, args.metric)
+    if similar is None:
+        print(f"Player {args.player_name} not found in the {args.season} season.")
+    else:
+        print(similar.to_string(index=False))
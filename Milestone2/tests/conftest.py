@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The Milestone2 scripts import each other as top-level modules (they are run from Milestone2/),
+# so the tests put that folder on the path the same way:
+#   cd Milestone2 && python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
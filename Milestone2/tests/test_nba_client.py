@@ -0,0 +1,129 @@
+import asyncio
+import gzip
+import json
+import time
+import urllib.request
+from datetime import date
+
+import pytest
+
+from nba_client import ResponseCache, StatsClient
+from nba_stub_server import StubOptions, StubServer
+
+# StatsClient against nba_stub_server.StubServer: retries, the response cache and the concurrency
+# and rate limits, all without the network
+FINISHED_SEASON = '2020-21'
+CURRENT_SEASON = f"{date.today().year}-{(date.today().year + 1) % 100:02d}"
+
+
+@pytest.fixture
+def server():
+    with StubServer() as server:
+        yield server
+
+
+def stub_stats(server):
+    with urllib.request.urlopen(f"http://{server.host}:{server.port}/_stats") as response:
+        return json.load(response)
+
+
+def client(server, **kwargs):
+    kwargs = {'requests_per_second': None, 'backoff': 0.01, 'cache_dir': None, **kwargs}
+    return StatsClient(base_url=server.base_url, **kwargs)
+
+
+def get_all(server, requests, **kwargs):
+    # [(endpoint, params), ...] -> payloads, all requested concurrently through one client
+    async def main():
+        async with client(server, **kwargs) as stats_client:
+            return await asyncio.gather(*(stats_client.get(endpoint, params) for endpoint, params in requests))
+    return asyncio.run(main())
+
+
+def player_index(season):
+    return 'playerindex', {'LeagueID': '00', 'Season': season}
+
+
+def age_cache_entry(cache_dir, endpoint, params, seconds):
+    cache = ResponseCache(str(cache_dir))
+    path = cache.path(cache.key(endpoint, params))
+    with gzip.open(path, 'rt') as f:
+        entry = json.load(f)
+    entry['fetched_at'] -= seconds
+    with gzip.open(path, 'wt') as f:
+        json.dump(entry, f)
+
+
+@pytest.mark.parametrize('status, options', [(429, StubOptions(rate_429=0.5, seed=1)),
+                                             (500, StubOptions(error_rate=0.5, seed=1))])
+def test_retries_until_success(status, options):
+    with StubServer(options) as server:
+        payloads = get_all(server, [player_index(CURRENT_SEASON)] * 10, retries=10)
+        stats = stub_stats(server)
+    assert all(payload is not None for payload in payloads)
+    assert stats['by_status']['200'] == 10
+    assert stats['by_status'][str(status)] > 0
+    assert stats['requests'] == 10 + stats['by_status'][str(status)]
+
+
+def test_gives_up_after_retries():
+    with StubServer(StubOptions(rate_429=1.0)) as server:
+        payloads = get_all(server, [player_index(CURRENT_SEASON)], retries=2)
+        stats = stub_stats(server)
+    assert payloads == [None]
+    assert stats['requests'] == 3
+
+
+def test_cache_hit(server, tmp_path):
+    first = get_all(server, [player_index(CURRENT_SEASON)], cache_dir=str(tmp_path))
+    second = get_all(server, [player_index(CURRENT_SEASON)], cache_dir=str(tmp_path))
+    assert first == second
+    assert stub_stats(server)['requests'] == 1
+
+
+def test_cache_expires_after_ttl(server, tmp_path):
+    endpoint, params = player_index(CURRENT_SEASON)
+    ttls = {'playerindex': 60}
+    get_all(server, [(endpoint, params)], cache_dir=str(tmp_path), ttls=ttls)
+    age_cache_entry(tmp_path, endpoint, params, 30)
+    get_all(server, [(endpoint, params)], cache_dir=str(tmp_path), ttls=ttls)
+    assert stub_stats(server)['requests'] == 1
+    age_cache_entry(tmp_path, endpoint, params, 120)
+    get_all(server, [(endpoint, params)], cache_dir=str(tmp_path), ttls=ttls)
+    assert stub_stats(server)['requests'] == 2
+
+
+def test_finished_season_never_expires(server, tmp_path):
+    endpoint, params = player_index(FINISHED_SEASON)
+    get_all(server, [(endpoint, params)], cache_dir=str(tmp_path), ttls={'playerindex': 60})
+    age_cache_entry(tmp_path, endpoint, params, 10 * 365 * 24 * 60 * 60)
+    get_all(server, [(endpoint, params)], cache_dir=str(tmp_path), ttls={'playerindex': 60})
+    assert stub_stats(server)['requests'] == 1
+
+
+def test_offline_serves_from_cache(server, tmp_path):
+    cached, missing = player_index(CURRENT_SEASON), player_index(FINISHED_SEASON)
+    online = get_all(server, [cached], cache_dir=str(tmp_path))
+    # offline ignores the TTL too, so even an old entry is served
+    age_cache_entry(tmp_path, *cached, 10 * 365 * 24 * 60 * 60)
+    offline = get_all(server, [cached, missing], cache_dir=str(tmp_path), offline=True)
+    assert offline == [online[0], None]
+    assert stub_stats(server)['requests'] == 1
+
+
+def test_concurrency_limit():
+    with StubServer(StubOptions(latency=0.05)) as server:
+        get_all(server, [player_index(str(season)) for season in range(20)], max_concurrency=3)
+        stats = stub_stats(server)
+    assert stats['requests'] == 20
+    assert stats['max_in_flight'] == 3
+
+
+def test_rate_limit(server):
+    start = time.monotonic()
+    get_all(server, [player_index(str(season)) for season in range(10)], max_concurrency=10,
+            requests_per_second=20, burst=1)
+    elapsed = time.monotonic() - start
+    assert stub_stats(server)['requests'] == 10
+    # one token at the start, then 9 more at 20 per second
+    assert elapsed >= 9 / 20 * 0.9
@@ -0,0 +1,99 @@
+import json
+import socket
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from nba_client import ResponseCache
+from nba_stub_server import ENDPOINTS, StubOptions, StubServer
+
+
+def get(server, endpoint, params=''):
+    # (status, headers, decoded body or None)
+    try:
+        with urllib.request.urlopen(f"{server.base_url}/{endpoint}?{params}") as response:
+            return response.status, response.headers, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_binds_free_port():
+    with StubServer() as server:
+        assert server.port != 0
+        assert get(server, 'playerindex', 'Season=2024-25')[0] == 200
+
+
+def test_binds_given_port():
+    port = free_port()
+    with StubServer(port=port) as server:
+        assert server.port == port
+        assert get(server, 'playerindex', 'Season=2024-25')[0] == 200
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_synthetic_payloads(endpoint):
+    with StubServer() as server:
+        status, _, data = get(server, endpoint, 'GameID=0022400001&Season=2024-25&SeasonYear=2024&PlayerID=1600001')
+    assert status == 200
+    result = data['resultSets'][0]
+    assert result['rowSet'] and all(len(row) == len(result['headers']) for row in result['rowSet'])
+
+
+def test_unknown_endpoint():
+    with StubServer() as server:
+        assert get(server, 'teamgamelog')[0] == 404
+        assert server.stats['by_status'] == {'404': 1}
+
+
+def test_latency():
+    with StubServer(StubOptions(latency=0.2)) as server:
+        start = time.monotonic()
+        get(server, 'playerindex', 'Season=2024-25')
+        assert time.monotonic() - start >= 0.2
+
+
+def test_injected_429():
+    with StubServer(StubOptions(rate_429=1.0, retry_after=3)) as server:
+        status, headers, _ = get(server, 'playerindex', 'Season=2024-25')
+        assert status == 429
+        assert headers['Retry-After'] == '3'
+        assert server.stats['by_status'] == {'429': 1}
+
+
+def test_injected_500():
+    with StubServer(StubOptions(error_rate=1.0)) as server:
+        assert get(server, 'playerindex', 'Season=2024-25')[0] == 500
+        assert server.stats['by_status'] == {'500': 1}
+
+
+def test_injected_rates():
+    with StubServer(StubOptions(rate_429=0.2, error_rate=0.3, seed=0)) as server:
+        for _ in range(200):
+            get(server, 'commonplayerinfo', 'PlayerID=1600001')
+        by_status = server.stats['by_status']
+    assert sum(by_status.values()) == 200
+    assert 20 <= by_status['429'] <= 60
+    assert 35 <= by_status['500'] <= 85
+
+
+def test_replays_recorded_responses(tmp_path):
+    recorded = {'resultSets': [{'name': 'PlayerIndex', 'headers': ['PERSON_ID'], 'rowSet': [[1]]}]}
+    ResponseCache(str(tmp_path)).store('playerindex', {'Season': '2024-25'}, recorded)
+    with StubServer(StubOptions(replay_dir=str(tmp_path))) as server:
+        assert get(server, 'playerindex', 'Season=2024-25')[2] == recorded
+        assert get(server, 'playerindex', 'Season=2023-24')[2] != recorded
+
+
+def test_reset_stats():
+    with StubServer() as server:
+        get(server, 'playerindex', 'Season=2024-25')
+        server.reset_stats()
+        assert server.stats['requests'] == 0 and server.stats['by_status'] == {}